@@ -0,0 +1,196 @@
+"""
+Outlier detection over a dataset's stored rows.
+
+Each numeric value is compared with the other values of its equipment Type
+(rows without a Type are compared with the whole dataset) in two ways:
+
+- z-score: |value - mean| / std above ANOMALY_ZSCORE_THRESHOLD, using the
+  sufficient statistics from stats.py;
+- IQR: outside [Q1 - f * IQR, Q3 + f * IQR] with f = ANOMALY_IQR_FACTOR,
+  using quartiles from the dataset's quantile sketches.
+
+Detection runs once at ingest, chunk by chunk over the memory-mapped columns,
+with per-Type parameters looked up by dictionary code so no Python code runs
+per row. Flagged rows are kept next to the rows in the columnar store:
+
+    anomalies.rows.npy      int64 positions of the flagged rows
+    anomalies.scores.npy    float32 z-scores, one column per numeric field
+    anomalies.flags.npy     uint8 bit mask, see zscore_bit() and iqr_bit()
+    anomalies.json          thresholds the rows were flagged with
+"""
+
+import json
+import os
+
+import numpy as np
+from django.conf import settings
+
+from .stats import mean, std
+from .storage import NUMERIC_FIELDS, storage_dir
+
+
+ROWS_FILE = 'anomalies.rows.npy'
+SCORES_FILE = 'anomalies.scores.npy'
+FLAGS_FILE = 'anomalies.flags.npy'
+META_FILE = 'anomalies.json'
+
+ZSCORE = 'zscore'
+IQR = 'iqr'
+# Two bits per numeric field, in NUMERIC_FIELDS order
+FIELDS = list(NUMERIC_FIELDS.values())
+
+
+def zscore_bit(index):
+    return 1 << (2 * index)
+
+
+def iqr_bit(index):
+    return 1 << (2 * index + 1)
+
+
+def _parameters(values, codes_to_types, overall):
+    """
+    Array indexed by Type code holding 'values[type]', with the overall
+    value in the last slot so that the missing-Type code -1 picks it up.
+    """
+    array = np.full(len(codes_to_types) + 1, np.nan, dtype=np.float64)
+    for code, eq_type in enumerate(codes_to_types):
+        value = values.get(eq_type)
+        array[code] = np.nan if value is None else value
+    array[-1] = np.nan if overall is None else overall
+    return array
+
+
+def detect_anomalies(rows, stats, sketches, chunk_rows):
+    """
+    Flag the outliers of a ColumnarDataset given its statistics block and
+    SketchSet, and save them next to its rows. Returns the number of flagged
+    rows.
+    """
+    threshold = settings.ANOMALY_ZSCORE_THRESHOLD
+    factor = settings.ANOMALY_IQR_FACTOR
+    types = [str(eq_type) for eq_type in rows.categories('Type')]
+    type_quartiles = sketches.type_percentiles([25, 75])
+    overall_quartiles = sketches.column_percentiles([25, 75])
+
+    parameters = {}
+    for field in FIELDS:
+        by_type = {eq_type: columns[field] for eq_type, columns in stats['by_type'].items()}
+        overall = stats['overall'][field]
+        quartiles = {eq_type: columns[field] for eq_type, columns in type_quartiles.items()}
+        q1 = _parameters({t: q['p25'] for t, q in quartiles.items()}, types, overall_quartiles[field]['p25'])
+        q3 = _parameters({t: q['p75'] for t, q in quartiles.items()}, types, overall_quartiles[field]['p75'])
+        parameters[field] = {
+            'mean': _parameters({t: mean(c) for t, c in by_type.items()}, types, mean(overall)),
+            'std': _parameters({t: std(c) for t, c in by_type.items()}, types, std(overall)),
+            'low': q1 - factor * (q3 - q1),
+            'high': q3 + factor * (q3 - q1),
+        }
+
+    flagged_rows, flagged_scores, flagged_flags = [], [], []
+    for start in range(0, len(rows), chunk_rows):
+        stop = min(start + chunk_rows, len(rows))
+        codes = np.asarray(rows.codes('Type')[start:stop])
+        scores = np.empty((stop - start, len(FIELDS)), dtype=np.float32)
+        flags = np.zeros(stop - start, dtype=np.uint8)
+        for index, (column, field) in enumerate(NUMERIC_FIELDS.items()):
+            values = np.asarray(rows.numeric(column)[start:stop])
+            params = parameters[field]
+            spread = params['std'][codes]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # Constant groups (std 0) have no meaningful z-score
+                z = np.where(spread > 0, (values - params['mean'][codes]) / spread, np.nan)
+            scores[:, index] = z
+            # Comparisons with NaN are False, so missing values never flag
+            flags |= np.where(np.abs(z) > threshold, zscore_bit(index), 0).astype(np.uint8)
+            outside = (values < params['low'][codes]) | (values > params['high'][codes])
+            flags |= np.where(outside, iqr_bit(index), 0).astype(np.uint8)
+        selected = np.flatnonzero(flags)
+        flagged_rows.append(selected + start)
+        flagged_scores.append(scores[selected])
+        flagged_flags.append(flags[selected])
+
+    path = rows.path
+    anomaly_rows = np.concatenate(flagged_rows) if flagged_rows else np.empty(0, dtype=np.int64)
+    np.save(os.path.join(path, SCORES_FILE), (
+        np.concatenate(flagged_scores) if flagged_scores else np.empty((0, len(FIELDS)), dtype=np.float32)
+    ))
+    np.save(os.path.join(path, FLAGS_FILE), (
+        np.concatenate(flagged_flags) if flagged_flags else np.empty(0, dtype=np.uint8)
+    ))
+    with open(os.path.join(path, META_FILE), 'w') as handle:
+        json.dump({'zscore': threshold, 'iqr_factor': factor}, handle)
+    # Written last: its presence marks a complete result
+    np.save(os.path.join(path, ROWS_FILE), anomaly_rows.astype(np.int64))
+    return len(anomaly_rows)
+
+
+def has_anomalies(storage_path):
+    return os.path.exists(os.path.join(storage_dir(storage_path), ROWS_FILE))
+
+
+class AnomalyIndex:
+    """
+    Read-only, memory-mapped view over the stored outliers of a dataset.
+    """
+
+    def __init__(self, storage_path):
+        path = storage_dir(storage_path)
+        self.rows = np.load(os.path.join(path, ROWS_FILE), mmap_mode='r')
+        self.scores = np.load(os.path.join(path, SCORES_FILE), mmap_mode='r')
+        self.flags = np.load(os.path.join(path, FLAGS_FILE), mmap_mode='r')
+        with open(os.path.join(path, META_FILE)) as handle:
+            self.thresholds = json.load(handle)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def select(self, field=None):
+        """
+        Positions (into this index) of the outliers, optionally only those
+        flagged on 'field'.
+        """
+        if field is None:
+            return np.arange(len(self.rows))
+        index = FIELDS.index(field)
+        mask = zscore_bit(index) | iqr_bit(index)
+        return np.flatnonzero(np.asarray(self.flags) & mask)
+
+    def counts(self):
+        """
+        Number of outliers per field and method.
+        """
+        flags = np.asarray(self.flags)
+        return {
+            field: {
+                ZSCORE: int(np.count_nonzero(flags & zscore_bit(index))),
+                IQR: int(np.count_nonzero(flags & iqr_bit(index))),
+            }
+            for index, field in enumerate(FIELDS)
+        }
+
+    def entries(self, positions):
+        """
+        Row number, z-scores and triggered methods for the given positions.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        scores = np.asarray(self.scores[positions], dtype=np.float64)
+        flags = np.asarray(self.flags[positions])
+        entries = []
+        for row, row_scores, row_flags in zip(self.rows[positions].tolist(), scores, flags):
+            entries.append({
+                'row': row,
+                'scores': {
+                    field: None if np.isnan(score) else round(float(score), 3)
+                    for field, score in zip(FIELDS, row_scores)
+                },
+                'flags': {
+                    field: [
+                        method for method, bit in ((ZSCORE, zscore_bit(index)), (IQR, iqr_bit(index)))
+                        if row_flags & bit
+                    ]
+                    for index, field in enumerate(FIELDS)
+                    if row_flags & (zscore_bit(index) | iqr_bit(index))
+                },
+            })
+        return entries
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    name = 'api'
+
+    def ready(self):
+        # Connect the signal handlers that keep cached users fresh
+        from . import authentication  # noqa: F401
@@ -0,0 +1,105 @@
+"""
+Async variants of the summary, history, upload and PDF endpoints for ASGI
+deployments (see ASYNC_ENDPOINTS).
+
+Under ASGI Django runs every synchronous view on one shared thread, so a
+slow CSV parse or PDF render holds up every other request of the process,
+and under WSGI each slow client pins a worker. These views are coroutines
+instead:
+
+- the ASGI handler has already buffered the request body without holding a
+  thread, so slow uploaders cost no worker;
+- the blocking work (ORM queries, pandas, waiting for the reportlab process
+  pool, JSON rendering) runs the existing view code in a bounded thread pool
+  of ASYNC_OFFLOAD_THREADS threads;
+- PDF files are streamed to the client from the event loop, each chunk read
+  in the pool, so a slow download does not tie up a thread either.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import FileResponse
+
+from .profiling import track_queries
+from .views import GeneratePDFReportView, HistoryView, SummaryView, UploadCSVView
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.ASYNC_OFFLOAD_THREADS, thread_name_prefix='offload'
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        with track_queries():
+            return func(*args, **kwargs)
+    finally:
+        # Pool threads outlive requests; close their connections like the
+        # request_finished handler does for request threads
+        close_old_connections()
+
+
+async def offload(func, *args, **kwargs):
+    """
+    Run a blocking call in the offload pool and wait for it without
+    blocking the event loop.
+    """
+    return await sync_to_async(_run, thread_sensitive=False, executor=_get_executor())(func, args, kwargs)
+
+
+async def _read_chunks(handle):
+    read = sync_to_async(handle.read, thread_sensitive=False, executor=_get_executor())
+    try:
+        while True:
+            chunk = await read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        handle.close()
+
+
+def offloaded(view_class):
+    """
+    Async view running 'view_class' (a DRF APIView) in the offload pool.
+    """
+    view = view_class.as_view()
+
+    def handle(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        # Render in the pool rather than on the event loop's shared thread
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+
+    async def async_view(request, *args, **kwargs):
+        response = await offload(handle, request, *args, **kwargs)
+        if isinstance(response, FileResponse) and response.file_to_stream is not None:
+            response.streaming_content = _read_chunks(response.file_to_stream)
+        return response
+
+    # Like APIView.as_view(): authentication is by token, not session
+    async_view.csrf_exempt = True
+    async_view.cls = view_class
+    return async_view
+
+
+summary_view = offloaded(SummaryView)
+history_view = offloaded(HistoryView)
+upload_view = offloaded(UploadCSVView)
+generate_pdf_view = offloaded(GeneratePDFReportView)
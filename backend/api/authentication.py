@@ -0,0 +1,70 @@
+"""
+Authentication classes used by the API.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .metrics import record_cache
+
+
+def _user_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    """
+    Forget the cached user after the current transaction commits.
+    """
+    transaction.on_commit(lambda: cache.delete(_user_key(user_id)))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the resolved User in the cache for
+    AUTH_USER_CACHE_TIMEOUT seconds, so warm requests authenticate without
+    touching the user table.
+
+    Saving or deleting a User drops its entry. Bulk updates bypass model
+    signals, so a user deactivated with QuerySet.update() keeps working
+    until the entry expires.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = _user_key(user_id)
+        user = cache.get(key)
+        record_cache('auth_user', user is not None)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+
+        # Same checks as JWTAuthentication.get_user, against the cached row
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+        return user
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def _drop_cached_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
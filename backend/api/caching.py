@@ -0,0 +1,46 @@
+"""
+Per-user caching of API payloads in Django's cache framework.
+
+Cached entries live under a per-user version token. Invalidating replaces
+the token once the surrounding transaction commits, so a request that read
+the database before the change can only store its result under the old,
+now unreachable, key.
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(namespace, user_id):
+    return f'{namespace}-version:{user_id}'
+
+
+def _version(namespace, user_id):
+    key = _version_key(namespace, user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def user_cache_key(namespace, user_id):
+    """
+    Current cache key for 'namespace' entries of a user.
+    """
+    return f'{namespace}:{user_id}:{_version(namespace, user_id)}'
+
+
+def invalidate_user_cache(namespace, user_id):
+    """
+    Drop the user's cached 'namespace' entries after the current transaction
+    commits (immediately in autocommit mode).
+    """
+    def bump():
+        cache.set(_version_key(namespace, user_id), uuid.uuid4().hex, None)
+    transaction.on_commit(bump)
+
+
+SUMMARY = 'summary'
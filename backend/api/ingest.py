@@ -0,0 +1,393 @@
+"""
+CSV ingestion helpers for equipment datasets.
+
+The in-memory path parses the whole upload into a single DataFrame, while the
+streaming path reads the upload handle in fixed-size chunks and accumulates
+the summary incrementally so peak memory follows the chunk size.
+
+Both parse with an explicit schema (CSV_DTYPES) instead of letting pandas
+infer types. A value that is not a number makes the typed parse fail; the
+file is then scanned once more with the numeric columns read as text to
+report every offending row per column (see find_invalid_values).
+
+pandas is imported inside the functions that parse, so importing the API
+(every worker boot and manage.py command) does not load it.
+"""
+
+import importlib.util
+import logging
+import os
+
+import numpy as np
+from django.conf import settings
+
+from .anomalies import detect_anomalies
+from .metrics import record_upload
+from .models import Dataset
+from .profiling import phase, timed
+from .reports import prerender_report
+from .sketches import SketchSet
+from .stats import (
+    PERCENTILES, empty_stats, group_frame, grouped_percentiles, grouped_stats,
+    mean, merge_stats, type_statistics
+)
+from .storage import NUMERIC_FIELDS, ColumnarDataset, ColumnarWriter, remove_storage
+
+
+logger = logging.getLogger(__name__)
+
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+# Parsing schema; columns not listed here are left to pandas
+CSV_DTYPES = {
+    'Equipment Name': str,
+    'Type': 'category',
+    'Flowrate': np.float64,
+    'Pressure': np.float64,
+    'Temperature': np.float64,
+}
+# Row numbers listed per column in validation errors
+MAX_REPORTED_ROWS = 10
+NOT_UTF8_MESSAGE = 'CSV file must be UTF-8 encoded'
+
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+
+class CSVValidationError(ValueError):
+    """
+    Raised when an uploaded CSV does not match the expected equipment layout.
+    'invalid_rows' maps each numeric column holding values that are not
+    numbers to their count and first row numbers.
+    """
+
+    def __init__(self, message, invalid_rows=None):
+        super().__init__(message)
+        self.invalid_rows = invalid_rows or {}
+
+
+class EmptyCSVError(CSVValidationError):
+    """
+    Raised when an uploaded CSV holds no rows.
+    """
+
+    def __init__(self, message='CSV file is empty'):
+        super().__init__(message)
+
+
+def csv_engine():
+    """
+    Parser engine for whole-file reads: CSV_PARSER_ENGINE, where 'auto'
+    picks pyarrow when it is installed. Chunked reads always use the C
+    engine, as pyarrow does not support them.
+    """
+    engine = settings.CSV_PARSER_ENGINE
+    if engine == 'auto':
+        return 'pyarrow' if PYARROW_AVAILABLE else 'c'
+    return engine
+
+
+def validate_columns(columns):
+    """
+    Raise CSVValidationError if any required column is missing.
+    """
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_columns:
+        raise CSVValidationError(f'Missing required columns: {", ".join(missing_columns)}')
+
+
+def invalid_numeric_rows(frame, offset=0):
+    """
+    Positions of the values in each numeric column of 'frame' (read as text)
+    that are present but not numbers, counted from 'offset':
+    {column: array of positions}.
+    """
+    import pandas as pd
+
+    invalid = {}
+    for column in NUMERIC_COLUMNS:
+        if column not in frame:
+            continue
+        raw = frame[column]
+        # Missing values were already turned into NaN by the parser
+        bad = pd.to_numeric(raw, errors='coerce').isna().to_numpy() & raw.notna().to_numpy()
+        positions = np.flatnonzero(bad)
+        if len(positions):
+            invalid[column] = positions + offset
+    return invalid
+
+
+def find_invalid_values(file_obj, chunk_rows):
+    """
+    Rewind the upload and scan it once, with the numeric columns read as
+    text, for values that are not numbers. Returns {column: {'count': n,
+    'rows': [...]}} with the first MAX_REPORTED_ROWS row numbers as shown in
+    a spreadsheet (the header is row 1).
+    """
+    import pandas as pd
+
+    file_obj.seek(0)
+    reader = pd.read_csv(
+        file_obj, encoding='utf-8', chunksize=chunk_rows,
+        dtype={column: str for column in NUMERIC_COLUMNS},
+        usecols=lambda column: column in NUMERIC_COLUMNS,
+    )
+    invalid = {}
+    offset = 0
+    with reader:
+        for chunk in reader:
+            for column, positions in invalid_numeric_rows(chunk, offset).items():
+                found = invalid.setdefault(column, {'count': 0, 'rows': []})
+                found['count'] += len(positions)
+                room = MAX_REPORTED_ROWS - len(found['rows'])
+                # +2: one for the header, one for counting from 1
+                found['rows'].extend((positions[:room] + 2).tolist())
+            offset += len(chunk)
+    return invalid
+
+
+def _invalid_values_error(invalid):
+    parts = []
+    for column, found in invalid.items():
+        rows = ', '.join(map(str, found['rows']))
+        if found['count'] > len(found['rows']):
+            rows += f' and {found["count"] - len(found["rows"])} more'
+        parts.append(f'{column} (row{"s" if found["count"] > 1 else ""} {rows})')
+    return CSVValidationError(f'Values are not numbers in {"; ".join(parts)}', invalid)
+
+
+def _parse_failed(file_obj, error):
+    """
+    Turn a failed typed parse into a CSVValidationError: one for a file that
+    is not UTF-8, one naming the rows whose values are not numbers if there
+    are any, otherwise one for the malformed file. Other errors are left to
+    the caller.
+    """
+    import pandas as pd
+
+    if isinstance(error, UnicodeDecodeError):
+        raise CSVValidationError(NOT_UTF8_MESSAGE) from error
+    try:
+        invalid = find_invalid_values(file_obj, settings.CSV_INGEST_CHUNK_ROWS)
+    except UnicodeDecodeError as e:
+        # The pyarrow engine reports undecodable bytes as a parse error
+        raise CSVValidationError(NOT_UTF8_MESSAGE) from e
+    except (ValueError, OSError):
+        # Unreadable as text as well (malformed quoting, unseekable handle)
+        invalid = {}
+    if invalid:
+        raise _invalid_values_error(invalid) from error
+    if isinstance(error, pd.errors.ParserError):
+        raise CSVValidationError(f'Malformed CSV: {error}') from error
+
+
+def read_csv_frame(file_obj):
+    """
+    Parse the whole upload into one validated DataFrame.
+    """
+    import pandas as pd
+
+    try:
+        df = pd.read_csv(file_obj, encoding='utf-8', dtype=CSV_DTYPES, engine=csv_engine())
+    except pd.errors.EmptyDataError as e:
+        raise EmptyCSVError() from e
+    except ValueError as e:
+        _parse_failed(file_obj, e)
+        raise
+    validate_columns(df.columns)
+    # A file with only a header parses into a frame without rows
+    if df.empty:
+        raise EmptyCSVError()
+    return df
+
+
+def iter_csv_chunks(file_obj, chunk_rows):
+    """
+    Yield DataFrames of at most 'chunk_rows' rows read straight from the
+    upload handle. Columns are validated on the first chunk so a bad file is
+    rejected before the rest of it is read.
+    """
+    import pandas as pd
+
+    try:
+        reader = pd.read_csv(file_obj, encoding='utf-8', dtype=CSV_DTYPES, chunksize=chunk_rows)
+    except pd.errors.EmptyDataError as e:
+        raise EmptyCSVError() from e
+    except ValueError as e:
+        # The header is read (and decoded) when the reader is created
+        _parse_failed(file_obj, e)
+        raise
+    with reader:
+        try:
+            for index, chunk in enumerate(reader):
+                if index == 0:
+                    validate_columns(chunk.columns)
+                yield chunk
+        except CSVValidationError:
+            raise
+        except pd.errors.EmptyDataError as e:
+            raise EmptyCSVError() from e
+        except ValueError as e:
+            _parse_failed(file_obj, e)
+            raise
+
+
+class SummaryAccumulator:
+    """
+    Incrementally computes the dataset summary (row count, column means,
+    equipment type distribution, sufficient statistics and quantile
+    sketches) over a sequence of DataFrame chunks.
+    """
+
+    def __init__(self):
+        self.total_equipment = 0
+        self.stats = empty_stats()
+        self.sketches = SketchSet()
+        self.type_counts = {}
+
+    def update(self, chunk):
+        self.total_equipment += len(chunk)
+        grouped = group_frame(chunk)
+        self.stats = merge_stats(self.stats, grouped_stats(grouped))
+        self.sketches.update(grouped)
+        for eq_type, count in chunk['Type'].value_counts().items():
+            self.type_counts[eq_type] = self.type_counts.get(eq_type, 0) + int(count)
+
+    def result(self):
+        type_counts = sorted(self.type_counts.items(), key=lambda item: -item[1])
+        return {
+            'total_equipment': self.total_equipment,
+            **_averages(self.stats),
+            'type_distribution': dict(type_counts),
+            'stats': self.stats,
+            'quantile_sketches': self.sketches.to_dict(),
+            # Exact percentiles would need every value of a Type at once
+            'type_statistics': type_statistics(
+                self.stats, self.sketches.type_percentiles(PERCENTILES)
+            ),
+        }
+
+
+def _averages(stats):
+    """
+    Dataset averages of the numeric columns. Raises CSVValidationError for a
+    column holding no values at all, which has no average to store.
+    """
+    averages = {}
+    for column, field in NUMERIC_FIELDS.items():
+        value = mean(stats['overall'][field])
+        if value is None:
+            raise CSVValidationError(f'Column {column} has no values')
+        averages[f'average_{field}'] = value
+    return averages
+
+
+def summarize_frame(df):
+    """
+    Compute the dataset summary for a fully loaded DataFrame.
+    """
+    grouped = group_frame(df)
+    stats = grouped_stats(grouped)
+    sketches = SketchSet()
+    sketches.update(grouped)
+    return {
+        'total_equipment': len(df),
+        **_averages(stats),
+        'type_distribution': df['Type'].value_counts().to_dict(),
+        'stats': stats,
+        'quantile_sketches': sketches.to_dict(),
+        'type_statistics': type_statistics(stats, grouped_percentiles(grouped)),
+    }
+
+
+def summarize_csv_stream(file_obj, chunk_rows, writer=None):
+    """
+    Compute the dataset summary by streaming the upload in chunks.
+    Each chunk is also appended to 'writer' (a ColumnarWriter) if given.
+    Raises EmptyCSVError if the file holds no rows.
+    """
+    accumulator = SummaryAccumulator()
+    for chunk in timed(iter_csv_chunks(file_obj, chunk_rows), 'parse'):
+        with phase('summary'):
+            accumulator.update(chunk)
+        if writer is not None:
+            with phase('store'):
+                writer.append(chunk)
+    # A file with only a header yields a single empty chunk
+    if accumulator.total_equipment == 0:
+        raise EmptyCSVError()
+    return accumulator.result()
+
+
+def _file_size(file_obj):
+    """
+    Size in bytes of an upload (UploadedFile) or open file, None if unknown.
+    """
+    size = getattr(file_obj, 'size', None)
+    if size is not None:
+        return size
+    try:
+        return os.fstat(file_obj.fileno()).st_size
+    except (AttributeError, OSError):
+        return None
+
+
+def create_dataset(user, name, file_obj, content_hash='', streaming=False):
+    """
+    Parse an uploaded CSV, persist its rows and create the Dataset for 'user'.
+    Returns (dataset, df); df is None when the file was streamed in chunks.
+    """
+    # Rows are persisted column by column while the summary is computed
+    with ColumnarWriter() as writer:
+        if streaming:
+            summary = summarize_csv_stream(
+                file_obj, settings.CSV_INGEST_CHUNK_ROWS, writer=writer
+            )
+            df = None
+        else:
+            with phase('parse'):
+                df = read_csv_frame(file_obj)
+            with phase('summary'):
+                summary = summarize_frame(df)
+            with phase('store'):
+                writer.append(df)
+
+    try:
+        # Outliers are flagged against the finished statistics, reading the
+        # freshly written columns back through memory maps
+        with phase('anomalies'):
+            detect_anomalies(
+                ColumnarDataset(writer.storage_path),
+                summary['stats'],
+                SketchSet.from_dict(summary['quantile_sketches']),
+                settings.CSV_INGEST_CHUNK_ROWS,
+            )
+        with phase('create'):
+            dataset = Dataset.objects.create(
+                user=user,
+                name=name,
+                storage_path=writer.storage_path,
+                content_hash=content_hash,
+                **summary
+            )
+    except Exception:
+        remove_storage(writer.storage_path)
+        raise
+
+    record_upload(
+        'streaming' if streaming else 'inline', _file_size(file_obj), summary['total_equipment']
+    )
+
+    # Maintain only the user's last datasets, unless a sweeper does it
+    if settings.DATASET_RETENTION_EVICTION == 'inline':
+        with phase('retention'):
+            Dataset.maintain_limit_per_user(user)
+
+    if settings.PDF_PRERENDER_ON_UPLOAD:
+        try:
+            prerender_report(dataset, user.username)
+        except Exception:
+            # The report is rendered on first download instead
+            logger.exception('Could not pre-render report for dataset %s', dataset.id)
+
+    return dataset, df
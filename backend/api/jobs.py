@@ -0,0 +1,148 @@
+"""
+Asynchronous upload processing.
+
+Uploads sent with ?async=1 are spooled to UPLOAD_JOB_SPOOL_ROOT, recorded as
+UploadJob rows and handed to a bounded local process pool, so the web worker
+can answer 202 right away. The UploadJob table is the queue: a job is claimed
+by flipping it from queued to running, which keeps the pool and the
+process_upload_jobs management command from processing it twice.
+
+A running job keeps its lease (UploadJob.updated_at) fresh from a heartbeat
+thread. Jobs left behind by a killed worker, or never handed to the pool,
+are picked up by reap_stale_jobs, which runs before every ?async=1 upload
+and whenever such a job is polled.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .ingest import CSVValidationError, create_dataset
+from .models import UploadJob
+from .workers import WorkerPool
+
+
+logger = logging.getLogger(__name__)
+
+upload_pool = WorkerPool('UPLOAD_JOB_WORKERS')
+
+
+def submit_job(job_id):
+    """
+    Hand a queued job to the process pool. If that fails the job simply
+    stays queued for the process_upload_jobs command.
+    """
+    try:
+        upload_pool.submit('api.jobs.run_job', str(job_id))
+    except Exception:
+        logger.exception('Could not schedule upload job %s', job_id)
+
+
+def _spool_upload(uploaded):
+    """
+    Keep a copy of the upload past the end of the request and return its path.
+    Temporary uploads on disk are moved rather than copied.
+    """
+    os.makedirs(settings.UPLOAD_JOB_SPOOL_ROOT, exist_ok=True)
+    path = os.path.join(settings.UPLOAD_JOB_SPOOL_ROOT, f'{uuid.uuid4().hex}.csv')
+    if hasattr(uploaded, 'temporary_file_path'):
+        shutil.move(uploaded.temporary_file_path(), path)
+    else:
+        with open(path, 'wb') as handle:
+            for chunk in uploaded.chunks():
+                handle.write(chunk)
+    return path
+
+
+def enqueue_upload(user, uploaded, content_hash=''):
+    """
+    Spool an uploaded CSV, create its UploadJob and schedule it once the
+    surrounding transaction commits.
+    """
+    spool_path = _spool_upload(uploaded)
+    job = UploadJob.objects.create(
+        user=user,
+        name=uploaded.name,
+        spool_path=spool_path,
+        content_hash=content_hash,
+    )
+    transaction.on_commit(lambda: submit_job(job.id))
+    return job
+
+
+ABANDONED_ERROR = 'Upload job was abandoned by its worker too many times'
+
+
+def reap_stale_jobs(schedule=True):
+    """
+    Requeue queued or running jobs whose lease expired, and hand them to the
+    pool again if 'schedule' is set, or fail them once they have been
+    claimed UPLOAD_JOB_MAX_ATTEMPTS times. Returns the number of jobs reaped.
+    """
+    reaped = 0
+    for job in UploadJob.expired():
+        # Only touch the job if nobody refreshed it meanwhile
+        unchanged = UploadJob.objects.filter(id=job.id, status=job.status, updated_at=job.updated_at)
+        if job.attempts >= settings.UPLOAD_JOB_MAX_ATTEMPTS:
+            if unchanged.update(status=UploadJob.FAILED, error=ABANDONED_ERROR, updated_at=timezone.now()):
+                job.discard_spool()
+                reaped += 1
+        elif unchanged.update(status=UploadJob.QUEUED, updated_at=timezone.now()):
+            logger.warning('Requeued stale upload job %s (%s)', job.id, job.status)
+            if schedule:
+                submit_job(job.id)
+            reaped += 1
+    return reaped
+
+
+def _heartbeat(job_id, stop):
+    interval = settings.UPLOAD_JOB_LEASE_SECONDS / 3
+    try:
+        while not stop.wait(interval):
+            UploadJob.objects.filter(id=job_id, status=UploadJob.RUNNING).update(updated_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def run_job(job_id):
+    """
+    Process one queued job. Safe to call from any process; a job that has
+    already been claimed is skipped.
+    """
+    claimed = UploadJob.objects.filter(id=job_id, status=UploadJob.QUEUED).update(
+        status=UploadJob.RUNNING, attempts=F('attempts') + 1, updated_at=timezone.now()
+    )
+    if not claimed:
+        return
+
+    job = UploadJob.objects.select_related('user').get(id=job_id)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job_id, stop), daemon=True)
+    heartbeat.start()
+    try:
+        # Always stream: the job may be arbitrarily large
+        with open(job.spool_path, 'rb') as handle:
+            dataset, _ = create_dataset(
+                job.user, job.name, handle,
+                content_hash=job.content_hash, streaming=True
+            )
+        job.dataset = dataset
+        job.status = UploadJob.DONE
+    except CSVValidationError as e:
+        job.status = UploadJob.FAILED
+        job.error = str(e)
+    except Exception as e:
+        job.status = UploadJob.FAILED
+        job.error = f'Error processing CSV: {str(e)}'
+    finally:
+        stop.set()
+        heartbeat.join()
+        job.discard_spool()
+        job.save(update_fields=['status', 'dataset', 'error', 'updated_at'])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.models import Dataset
+
+
+class Command(BaseCommand):
+    """
+    Compute the sufficient statistics and quantile sketches of datasets
+    uploaded before they were recorded, from their stored rows. Datasets
+    without stored rows are skipped.
+    """
+    help = 'Backfill Dataset.stats and quantile sketches from the columnar row store'
+
+    def handle(self, *args, **options):
+        datasets = Dataset.objects.filter(Q(stats={}) | Q(quantile_sketches={})).exclude(storage_path='')
+        updated = 0
+        for dataset in datasets.iterator():
+            dataset.ensure_stats()
+            updated += 1
+        self.stdout.write(f'Backfilled statistics for {updated} dataset(s)')
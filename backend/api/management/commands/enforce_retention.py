@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from api.models import Dataset
+
+
+class Command(BaseCommand):
+    """
+    Delete every user's datasets beyond their retention limit. Needed when
+    DATASET_RETENTION_EVICTION is 'deferred'; run it from cron, or keep it
+    running with --interval as a background sweeper.
+    """
+    help = 'Evict datasets beyond each user\'s retention limit'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Repeat the sweep every INTERVAL seconds instead of running once',
+        )
+
+    def sweep(self):
+        # Only users holding more datasets than the smallest configured limit
+        # can be over their own limit
+        smallest = min([settings.DATASET_RETENTION_LIMIT, *settings.DATASET_RETENTION_LIMITS.values()])
+        user_ids = (
+            Dataset.objects.filter(user__isnull=False)
+            .values('user')
+            .annotate(count=Count('id'))
+            .filter(count__gt=smallest)
+            .values_list('user', flat=True)
+        )
+        deleted = 0
+        for user in User.objects.filter(id__in=list(user_ids)):
+            deleted += Dataset.maintain_limit_per_user(user)
+        return deleted
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = self.sweep()
+            self.stdout.write(f'Deleted {deleted} dataset(s)')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import reap_stale_jobs, run_job
+from api.models import UploadJob
+
+
+class Command(BaseCommand):
+    """
+    Process queued asynchronous uploads in this process, oldest first.
+    Jobs whose lease expired are requeued (or failed) first. Useful for
+    draining the queue after a web worker restart.
+    """
+    help = 'Process queued asynchronous CSV uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recover',
+            action='store_true',
+            help='Requeue every running job before processing, even if its lease has not expired yet',
+        )
+
+    def handle(self, *args, **options):
+        if options['recover']:
+            recovered = UploadJob.objects.filter(status=UploadJob.RUNNING).update(status=UploadJob.QUEUED)
+            self.stdout.write(f'Requeued {recovered} running job(s)')
+        reaped = reap_stale_jobs(schedule=False)
+        if reaped:
+            self.stdout.write(f'Reaped {reaped} stale job(s)')
+
+        job_ids = list(
+            UploadJob.objects.filter(status=UploadJob.QUEUED).values_list('id', flat=True)
+        )
+        for job_id in job_ids:
+            run_job(job_id)
+            job = UploadJob.objects.get(id=job_id)
+            self.stdout.write(f'{job_id}: {job.status}')
@@ -0,0 +1,109 @@
+"""
+Prometheus metrics for the API, served in text format at /metrics.
+
+Metrics are kept in prometheus_client's default registry. gunicorn runs each
+worker in its own process, so when PROMETHEUS_MULTIPROC_DIR is set (see
+gunicorn.conf.py) every process, including upload job and PDF render
+workers, writes its samples to files in that shared directory and /metrics
+adds them up across processes.
+"""
+
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+
+REQUEST_LATENCY = Histogram(
+    'api_request_duration_seconds',
+    'Time spent handling requests, by view',
+    ['view', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+UPLOAD_BYTES = Counter(
+    'api_upload_bytes',
+    'Bytes of CSV ingested, by ingest mode',
+    ['mode'],
+)
+UPLOAD_ROWS = Counter(
+    'api_upload_rows',
+    'Equipment rows ingested, by ingest mode',
+    ['mode'],
+)
+PDF_RENDER_SECONDS = Histogram(
+    'api_pdf_render_duration_seconds',
+    'Time spent waiting for a PDF report to render, by report kind',
+    ['kind'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+CACHE_REQUESTS = Counter(
+    'api_cache_requests',
+    'Cache lookups by cache and result (hit or miss)',
+    ['cache', 'result'],
+)
+RETENTION_DELETIONS = Counter(
+    'api_retention_deleted_datasets',
+    'Datasets deleted by the retention limit',
+)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def record_upload(mode, size, rows):
+    if size is not None:
+        UPLOAD_BYTES.labels(mode=mode).inc(size)
+    UPLOAD_ROWS.labels(mode=mode).inc(rows)
+
+
+def render_metrics():
+    """
+    Current metrics in the Prometheus text format, as (body, content type).
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # A fresh registry per scrape, reading every process's samples
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Observes the latency of every request in REQUEST_LATENCY, labelled with
+    the name of the URL pattern it matched. Added to MIDDLEWARE when
+    METRICS_ENABLED is set; works in both sync and async stacks.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _observe(request, response, started):
+        # URL pattern name, or the view's dotted path for unnamed patterns
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        REQUEST_LATENCY.labels(
+            view=view, method=request.method, status=response.status_code
+        ).observe(time.perf_counter() - started)
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        return self._observe(request, self.get_response(request), started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        return self._observe(request, await self.get_response(request), started)
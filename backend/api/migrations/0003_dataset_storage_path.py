@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_dataset_user_dataset_api_dataset_user_id_993866_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='storage_path',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_dataset_storage_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['user', 'content_hash'], name='api_dataset_user_id_bcdae3_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_uploadjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
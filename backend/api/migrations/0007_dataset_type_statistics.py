@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_dataset_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='type_statistics',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_dataset_type_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='quantile_sketches',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Functional index on LOWER(auth_user.email) for the case-insensitive
+    email lookups done by login and registration.
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('api', '0008_dataset_quantile_sketches'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX api_user_email_lower_idx ON auth_user (LOWER(email))',
+            reverse_sql='DROP INDEX api_user_email_lower_idx',
+        ),
+    ]
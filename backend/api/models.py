@@ -1,12 +1,24 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
 from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
 import json
+import os
+import uuid
+from .caching import SUMMARY, invalidate_user_cache
+from .anomalies import AnomalyIndex, detect_anomalies, has_anomalies
+from .metrics import RETENTION_DELETIONS
+from .sketches import SketchSet
+from .stats import PERCENTILES, rows_stats, type_statistics as build_type_statistics
+from .storage import ColumnarDataset, remove_storage
 
 
 class Dataset(models.Model):
     """
     Model to store metadata for uploaded datasets.
-    Maintains only the last 5 uploaded datasets per user.
+    Maintains only the last DATASET_RETENTION_LIMIT uploaded datasets per user.
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='datasets', null=True, blank=True)
     name = models.CharField(max_length=255)
@@ -16,39 +28,241 @@ class Dataset(models.Model):
     average_pressure = models.FloatField()
     average_temperature = models.FloatField()
     type_distribution = models.JSONField()
+    # Directory (relative to DATASET_STORE_ROOT) holding the columnar rows
+    storage_path = models.CharField(max_length=64, blank=True, default='')
+    # SHA-256 of the uploaded bytes, used to short-circuit identical re-uploads
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    # Mergeable per-column statistics, overall and per Type (see stats.py)
+    stats = models.JSONField(blank=True, default=dict)
+    # Per-Type mean, std, min, max and percentiles of each numeric column
+    type_statistics = models.JSONField(blank=True, default=dict)
+    # Serialized KLL quantile sketches, overall and per Type (see sketches.py)
+    quantile_sketches = models.JSONField(blank=True, default=dict)
     
     class Meta:
         ordering = ['-upload_timestamp']
         indexes = [
             models.Index(fields=['user', '-upload_timestamp']),
+            models.Index(fields=['user', 'content_hash']),
         ]
     
     def __str__(self):
         username = self.user.username if self.user_id else 'unknown'
         return f"{username} - {self.name} - {self.upload_timestamp}"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.user_id:
+            invalidate_user_cache(SUMMARY, self.user_id)
+    
+    def delete(self, *args, **kwargs):
+        """
+        Delete the dataset together with its on-disk rows.
+        """
+        storage_path = self.storage_path
+        user_id = self.user_id
+        result = super().delete(*args, **kwargs)
+        remove_storage(storage_path)
+        if user_id:
+            invalidate_user_cache(SUMMARY, user_id)
+        return result
+    
+    def open_rows(self):
+        """
+        Return a memory-mapped ColumnarDataset over the stored rows,
+        or None if this dataset was uploaded before rows were persisted.
+        """
+        if not self.storage_path:
+            return None
+        return ColumnarDataset(self.storage_path)
+    
+    def ensure_stats(self):
+        """
+        Return the sufficient statistics of this dataset, computing and saving
+        them (and its quantile sketches) from the stored rows first if it
+        predates them. Returns {} when neither is available.
+        """
+        if (not self.stats or not self.quantile_sketches) and self.storage_path:
+            sketches = SketchSet()
+            self.stats = rows_stats(self.open_rows(), settings.CSV_INGEST_CHUNK_ROWS, sketches)
+            self.quantile_sketches = sketches.to_dict()
+            update_fields = ['stats', 'quantile_sketches']
+            if not self.type_statistics:
+                self.type_statistics = build_type_statistics(
+                    self.stats, sketches.type_percentiles(PERCENTILES)
+                )
+                update_fields.append('type_statistics')
+            self.save(update_fields=update_fields)
+        return self.stats
+    
+    def open_anomalies(self):
+        """
+        Return the AnomalyIndex of this dataset's outliers, detecting them
+        first if it predates outlier detection. None without stored rows.
+        """
+        if not self.storage_path:
+            return None
+        if not has_anomalies(self.storage_path):
+            detect_anomalies(
+                self.open_rows(), self.ensure_stats(), self.sketches(),
+                settings.CSV_INGEST_CHUNK_ROWS
+            )
+        return AnomalyIndex(self.storage_path)
+    
+    def sketches(self):
+        """
+        The dataset's quantile sketches as a SketchSet (empty if it has none).
+        """
+        return SketchSet.from_dict(self.quantile_sketches)
+    
+    @classmethod
+    def retention_limit(cls, user):
+        """
+        Number of datasets kept for 'user': DATASET_RETENTION_LIMITS[username]
+        if set, otherwise DATASET_RETENTION_LIMIT.
+        """
+        return settings.DATASET_RETENTION_LIMITS.get(user.username, settings.DATASET_RETENTION_LIMIT)
+    
+    @classmethod
+    def _delete_older_than(cls, queryset, limit):
+        """
+        Delete everything in 'queryset' after its 'limit' newest datasets,
+        selected by the last kept (upload_timestamp, id), then remove their
+        on-disk rows and invalidate their owners' summaries. Returns the
+        number of datasets deleted.
+
+        UploadJob.dataset is SET_NULL, so Django's deletion collector runs a
+        SELECT of the doomed ids and an UPDATE of api_uploadjob before the
+        DELETE; only the ids are loaded, not the statistics and sketches.
+        """
+        queryset = queryset.order_by('-upload_timestamp', '-id')
+        stale = queryset
+        if limit:
+            cutoff = queryset.values_list('upload_timestamp', 'id')[limit - 1:limit].first()
+            if cutoff is None:
+                return 0
+            timestamp, dataset_id = cutoff
+            stale = queryset.filter(
+                models.Q(upload_timestamp__lt=timestamp)
+                | models.Q(upload_timestamp=timestamp, id__lt=dataset_id)
+            )
+        doomed = {
+            dataset_id: (storage_path, user_id)
+            for dataset_id, storage_path, user_id in stale.values_list('id', 'storage_path', 'user_id')
+        }
+        if not doomed:
+            return 0
+        
+        with transaction.atomic():
+            deleted = stale.filter(id__in=list(doomed)).only('id').delete()[1].get(cls._meta.label, 0)
+            if deleted < len(doomed):
+                # A dataset re-uploaded meanwhile moved past the cutoff; keep its rows
+                for dataset_id in cls.objects.filter(id__in=list(doomed)).values_list('id', flat=True):
+                    del doomed[dataset_id]
+        
+        RETENTION_DELETIONS.inc(deleted)
+        storage_paths = [storage_path for storage_path, _ in doomed.values()]
+        transaction.on_commit(lambda: [remove_storage(path) for path in storage_paths])
+        for user_id in {user_id for _, user_id in doomed.values() if user_id}:
+            invalidate_user_cache(SUMMARY, user_id)
+        return deleted
+    
     @classmethod
     def maintain_limit(cls, limit=5):
         """
         Maintain only the last 'limit' datasets globally.
         Delete older datasets when limit is exceeded.
         """
-        count = cls.objects.count()
-        if count > limit:
-            # Get datasets to delete (oldest ones beyond the limit)
-            datasets_to_delete = cls.objects.all()[limit:]
-            for dataset in datasets_to_delete:
-                dataset.delete()
+        return cls._delete_older_than(cls.objects.all(), limit)
     
     @classmethod
-    def maintain_limit_per_user(cls, user, limit=5):
+    def maintain_limit_per_user(cls, user, limit=None):
         """
-        Maintain only the last 'limit' datasets per user.
-        Delete older datasets when limit is exceeded.
+        Maintain only the last 'limit' datasets per user (by default the
+        user's retention_limit). Delete older datasets when limit is exceeded.
+        """
+        if limit is None:
+            limit = cls.retention_limit(user)
+        return cls._delete_older_than(cls.objects.filter(user=user), limit)
+
+
+class UploadJob(models.Model):
+    """
+    Model to track CSV uploads processed asynchronously by the worker pool.
+    Queued jobs live in the database, so they survive a web worker restart
+    and can be drained with the process_upload_jobs management command.
+
+    updated_at doubles as a lease: a running job refreshes it while it works
+    (see jobs.run_job), so a job whose worker died stops refreshing it and
+    expires after UPLOAD_JOB_LEASE_SECONDS. A queued job that nobody picked
+    up expires after UPLOAD_JOB_QUEUED_TIMEOUT. Expired jobs do not count
+    towards the queue limit and are requeued or failed by jobs.reap_stale_jobs.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_jobs')
+    name = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    # Spooled copy of the upload, removed once the job finishes
+    spool_path = models.CharField(max_length=512)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    # Times the job has been claimed by a worker
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.id} - {self.name} - {self.status}"
+    
+    @classmethod
+    def _expired_filter(cls):
+        now = timezone.now()
+        return (
+            Q(status=cls.QUEUED, updated_at__lt=now - timedelta(seconds=settings.UPLOAD_JOB_QUEUED_TIMEOUT))
+            | Q(status=cls.RUNNING, updated_at__lt=now - timedelta(seconds=settings.UPLOAD_JOB_LEASE_SECONDS))
+        )
+    
+    @classmethod
+    def expired(cls):
+        """
+        Queued or running jobs whose lease ran out.
+        """
+        return cls.objects.filter(cls._expired_filter())
+    
+    @classmethod
+    def pending(cls):
         """
-        count = cls.objects.filter(user=user).count()
-        if count > limit:
-            # Get datasets to delete for this user (oldest ones beyond the limit)
-            datasets_to_delete = cls.objects.filter(user=user)[limit:]
-            for dataset in datasets_to_delete:
-                dataset.delete()
\ No newline at end of file
+        Queued or running jobs that are still live.
+        """
+        return cls.objects.filter(status__in=[cls.QUEUED, cls.RUNNING]).exclude(cls._expired_filter())
+    
+    @classmethod
+    def queue_is_full(cls):
+        """
+        True when UPLOAD_JOB_QUEUE_LIMIT live jobs are already queued or running.
+        """
+        return cls.pending().count() >= settings.UPLOAD_JOB_QUEUE_LIMIT
+    
+    def discard_spool(self):
+        try:
+            os.remove(self.spool_path)
+        except FileNotFoundError:
+            pass
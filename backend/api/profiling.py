@@ -0,0 +1,199 @@
+"""
+Opt-in per-request profiling.
+
+With REQUEST_PROFILING enabled, ProfilingMiddleware records for every
+request its total wall time, the number and duration of SQL queries, the
+peak memory allocated while it ran and the time spent in named phases, and
+returns them in a Server-Timing header:
+
+    Server-Timing: total;dur=412.3, db;dur=35.1;desc="14 queries",
+        parse;dur=180.2, summary;dur=95.4, ..., mem;desc="peak 48.2 MB"
+
+Requests slower than PROFILING_SLOW_REQUEST_MS are also logged as warnings
+on the 'api.profiling' logger.
+
+Code marks a phase with 'with phase(name):'; time spent in phases of the
+same name adds up, and outside a profiled request phase() does nothing.
+Work handed to other processes (the PDF render pool) only shows up as the
+time the request waited for it.
+
+Peak memory comes from tracemalloc, which is process-wide and slows Python
+allocations down noticeably; it is only exact when a process serves one
+request at a time, and can be turned off with PROFILING_TRACE_MEMORY.
+"""
+
+import contextvars
+import logging
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """
+    Timings collected for one request.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.queries = 0
+        self.query_time = 0.0
+        self.total = 0.0
+        self.peak_memory = None
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper() around every query
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - started
+
+    def _queries(self):
+        return f'{self.queries} quer{"y" if self.queries == 1 else "ies"}'
+
+    def server_timing(self):
+        metrics = [
+            f'total;dur={self.total * 1000:.1f}',
+            f'db;dur={self.query_time * 1000:.1f};desc="{self._queries()}"',
+        ]
+        metrics += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.phases.items()]
+        if self.peak_memory is not None:
+            metrics.append(f'mem;desc="peak {self.peak_memory / 2 ** 20:.1f} MB"')
+        return ', '.join(metrics)
+
+    def describe(self):
+        parts = [f'db={self.query_time * 1000:.1f}ms ({self._queries()})']
+        parts += [f'{name}={seconds * 1000:.1f}ms' for name, seconds in self.phases.items()]
+        if self.peak_memory is not None:
+            parts.append(f'peak memory {self.peak_memory / 2 ** 20:.1f} MB')
+        return ', '.join(parts)
+
+
+def current_profile():
+    """
+    Profile of the request being handled, or None when not profiling.
+    """
+    return _current.get()
+
+
+@contextmanager
+def phase(name):
+    """
+    Add the time spent in the block to phase 'name' of the current request.
+    """
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - started)
+
+
+@contextmanager
+def track_queries():
+    """
+    Count the SQL queries this thread runs inside the block towards the
+    current request. Connections belong to a thread, so work offloaded to
+    another thread needs its own track_queries().
+    """
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(profile.execute_wrapper))
+        yield
+
+
+def timed(iterable, name):
+    """
+    Iterate over 'iterable', counting the time spent producing each item
+    (but not consuming it) towards phase 'name'.
+    """
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class ProfilingMiddleware:
+    """
+    Profiles each request as described in the module docstring. Added to the
+    top of MIDDLEWARE when REQUEST_PROFILING is set, so its total covers the
+    rest of the stack. Works in both sync and async stacks; under ASGI only
+    queries run inside track_queries() (see async_views.offload) are counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.trace_memory = settings.PROFILING_TRACE_MEMORY
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _start(self):
+        profile = RequestProfile()
+        baseline = None
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        return profile, _current.set(profile), time.perf_counter(), baseline
+
+    def _finish(self, request, response, profile, started, baseline):
+        profile.total = time.perf_counter() - started
+        if baseline is not None:
+            profile.peak_memory = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+
+        response['Server-Timing'] = profile.server_timing()
+        if profile.total * 1000 >= settings.PROFILING_SLOW_REQUEST_MS:
+            logger.warning(
+                'Slow request: %s %s -> %s in %.1fms: %s',
+                request.method, request.get_full_path(), response.status_code,
+                profile.total * 1000, profile.describe()
+            )
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile, token, started, baseline = self._start()
+        try:
+            with track_queries():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile, started, baseline)
+
+    async def __acall__(self, request):
+        profile, token, started, baseline = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile, started, baseline)
@@ -0,0 +1,60 @@
+"""
+Faster JSON rendering for API responses.
+"""
+
+import sys
+
+import numpy as np
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .profiling import phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    """
+    Fallback for types orjson does not serialize itself: pandas timestamps
+    and missing markers, remaining numpy scalars, and everything DRF's own
+    encoder knows about (Decimal, lazy strings, querysets, ...).
+    """
+    # Without pandas loaded there are no pandas objects to encode
+    pd = sys.modules.get('pandas')
+    if pd is not None:
+        if obj is pd.NaT or obj is pd.NA:
+            return None
+        if isinstance(obj, pd.Timestamp):
+            return obj.to_pydatetime()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for JSONRenderer backed by orjson.
+
+    numpy arrays and scalars, datetimes and pandas timestamps are encoded
+    natively, and NaN/inf are written as null instead of failing. Falls back
+    to JSONRenderer when orjson is not installed.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with phase('render'):
+            if orjson is None:
+                return super().render(data, accepted_media_type, renderer_context)
+
+            if data is None:
+                return b''
+
+            option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+            if self.get_indent(accepted_media_type, renderer_context or {}):
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(data, default=_default, option=option)
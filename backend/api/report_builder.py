@@ -0,0 +1,243 @@
+"""
+Layout of the PDF report, built with reportlab.
+
+Only the render paths in reports.py import this module, so loading the API
+(every worker boot and manage.py command) does not pay for reportlab.
+"""
+
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+
+
+_styles = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_styles['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#667eea'),
+    spaceAfter=30,
+    alignment=TA_CENTER
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_styles['Heading2'],
+    fontSize=16,
+    textColor=colors.HexColor('#764ba2'),
+    spaceAfter=12,
+    spaceBefore=12
+)
+
+INFO_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#667eea')),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+])
+
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+])
+
+DISTRIBUTION_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#764ba2')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+])
+
+APPENDIX_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f0f0f8')]),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+])
+
+TYPE_STATISTICS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#764ba2')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+])
+
+TYPE_STATISTICS_HEADER = ['Equipment Type', 'Parameter', 'Mean', 'Std', 'Min', 'Max', 'P25', 'P50', 'P75', 'P95']
+TYPE_STATISTICS_KEYS = ['mean', 'std', 'min', 'max', 'p25', 'p50', 'p75', 'p95']
+TYPE_STATISTICS_COL_WIDTHS = [1.1*inch, 1.0*inch] + [0.55*inch] * len(TYPE_STATISTICS_KEYS)
+
+APPENDIX_HEADER = ['#', 'Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+APPENDIX_COL_WIDTHS = [0.7*inch, 2.1*inch, 1.3*inch, 0.9*inch, 0.9*inch, 0.9*inch]
+# Rows per appendix table; about one page, so only a page worth of cells is
+# ever held as flowables
+APPENDIX_ROWS_PER_TABLE = 50
+
+
+class StreamingDocTemplate(SimpleDocTemplate):
+    """
+    SimpleDocTemplate that pulls flowables from an iterator as the build
+    consumes them, instead of requiring the whole story up front.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._story = None
+        self._more_flowables = iter(())
+
+    def build_streaming(self, flowables, more_flowables):
+        self._story = list(flowables)
+        self._more_flowables = iter(more_flowables)
+        self._refill(self._story)
+        self.build(self._story)
+
+    def _refill(self, flowables):
+        # Keep two flowables queued so the build loop never sees an empty
+        # story while the iterator still has more
+        while len(flowables) < 2:
+            try:
+                flowables.append(next(self._more_flowables))
+            except StopIteration:
+                break
+
+    def filterFlowables(self, flowables):
+        # Also called on internal lists (e.g. hanging page-start flowables),
+        # which must not be refilled
+        if flowables is self._story:
+            self._refill(flowables)
+
+
+def _format_number(value):
+    return '' if value != value else f'{value:.2f}'
+
+
+def iter_appendix_flowables(rows):
+    """
+    Yield the appendix listing every stored row, one table per block of
+    APPENDIX_ROWS_PER_TABLE rows read from the memory-mapped columns.
+    """
+    yield PageBreak()
+    yield Paragraph("Equipment Appendix", HEADING_STYLE)
+    for start in range(0, len(rows), APPENDIX_ROWS_PER_TABLE):
+        stop = min(start + APPENDIX_ROWS_PER_TABLE, len(rows))
+        names = rows.decoded('Equipment Name', start, stop)
+        types = rows.decoded('Type', start, stop)
+        flowrate = rows.numeric('Flowrate')[start:stop]
+        pressure = rows.numeric('Pressure')[start:stop]
+        temperature = rows.numeric('Temperature')[start:stop]
+        data = [APPENDIX_HEADER]
+        for i in range(stop - start):
+            data.append([
+                str(start + i + 1),
+                names[i] or '',
+                types[i] or '',
+                _format_number(flowrate[i]),
+                _format_number(pressure[i]),
+                _format_number(temperature[i]),
+            ])
+        table = Table(data, colWidths=APPENDIX_COL_WIDTHS, repeatRows=1)
+        table.setStyle(APPENDIX_TABLE_STYLE)
+        yield table
+
+
+def _format_stat(value):
+    return '-' if value is None else f'{value:.2f}'
+
+
+def build_report(dataset, output, username, generated_at=None, rows=None):
+    """
+    Render the PDF report of 'dataset' into 'output' (a path or file-like).
+    If 'rows' (a ColumnarDataset) is given, an appendix listing every row is
+    added; its tables are generated block by block while the document is
+    built.
+    """
+    generated_at = generated_at or timezone.now()
+    doc = StreamingDocTemplate(output, pagesize=letter, pageCompression=1 if rows is not None else None)
+    elements = []
+
+    # Title
+    elements.append(Paragraph("Chemical Equipment Analysis Report", TITLE_STYLE))
+    elements.append(Spacer(1, 0.2*inch))
+
+    # Report Info
+    info_data = [
+        ['Report Generated:', generated_at.strftime('%Y-%m-%d %H:%M:%S')],
+        ['Dataset Name:', dataset.name],
+        ['Upload Date:', dataset.upload_timestamp.strftime('%Y-%m-%d %H:%M:%S')],
+        ['User:', username],
+    ]
+    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
+    info_table.setStyle(INFO_TABLE_STYLE)
+    elements.append(info_table)
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Summary Statistics
+    elements.append(Paragraph("Summary Statistics", HEADING_STYLE))
+    summary_data = [
+        ['Metric', 'Value'],
+        ['Total Equipment', str(dataset.total_equipment)],
+        ['Average Flowrate', f"{dataset.average_flowrate:.2f}"],
+        ['Average Pressure', f"{dataset.average_pressure:.2f}"],
+        ['Average Temperature', f"{dataset.average_temperature:.2f}"],
+    ]
+    summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
+    summary_table.setStyle(SUMMARY_TABLE_STYLE)
+    elements.append(summary_table)
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Equipment Type Distribution
+    elements.append(Paragraph("Equipment Type Distribution", HEADING_STYLE))
+    dist_data = [['Equipment Type', 'Count']]
+    for eq_type, count in dataset.type_distribution.items():
+        dist_data.append([eq_type, str(count)])
+    dist_table = Table(dist_data, colWidths=[3*inch, 3*inch])
+    dist_table.setStyle(DISTRIBUTION_TABLE_STYLE)
+    elements.append(dist_table)
+
+    # Statistics by Equipment Type
+    if dataset.type_statistics:
+        elements.append(Spacer(1, 0.3*inch))
+        elements.append(Paragraph("Statistics by Equipment Type", HEADING_STYLE))
+        type_stats_data = [TYPE_STATISTICS_HEADER]
+        for eq_type, columns in dataset.type_statistics.items():
+            for field, values in columns.items():
+                type_stats_data.append(
+                    [eq_type, field.capitalize()]
+                    + [_format_stat(values.get(key)) for key in TYPE_STATISTICS_KEYS]
+                )
+        type_stats_table = Table(type_stats_data, colWidths=TYPE_STATISTICS_COL_WIDTHS, repeatRows=1)
+        type_stats_table.setStyle(TYPE_STATISTICS_TABLE_STYLE)
+        elements.append(type_stats_table)
+
+    if rows is None:
+        doc.build(elements)
+    else:
+        doc.build_streaming(elements, iter_appendix_flowables(rows))
@@ -0,0 +1,248 @@
+"""
+PDF report rendering and caching.
+
+A dataset never changes after upload, so its report is rendered once and
+kept next to the dataset's rows in the columnar store; it is evicted
+together with the dataset. The "Report Generated" line records when that
+cached file was rendered. Cache keys (and ETags) cover everything else that
+appears in the report, so a key match means the same report.
+"""
+
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+
+from .metrics import PDF_RENDER_SECONDS
+from .models import Dataset
+from .profiling import phase
+from .storage import storage_dir
+from .workers import HostSlots, WorkerPool
+
+
+logger = logging.getLogger(__name__)
+
+# Renders run in their own processes so reportlab never occupies a request
+# worker's CPU; PDF_RENDER_WORKERS caps how many run at once.
+report_pool = WorkerPool('PDF_RENDER_WORKERS')
+
+_render_slots = None
+_render_slots_lock = threading.Lock()
+
+
+class RenderBusy(Exception):
+    """
+    Raised when the render queue is full or a render did not finish in time.
+    """
+
+
+# Bump when the report layout (report_builder.py) changes so cached PDFs are re-rendered
+REPORT_VERSION = 2
+
+
+def report_key(dataset, username):
+    """
+    Stable identifier of a dataset's report content, used as cache key and
+    ETag.
+    """
+    source = '|'.join([
+        str(REPORT_VERSION),
+        str(dataset.id),
+        dataset.content_hash,
+        dataset.upload_timestamp.isoformat(),
+        dataset.name,
+        username,
+        # Backfilling statistics adds a section to older datasets' reports
+        str(bool(dataset.type_statistics)),
+    ])
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:32]
+
+
+def report_etag(dataset, username):
+    return f'"{report_key(dataset, username)}"'
+
+
+def build_report(dataset, output, username, generated_at=None, rows=None):
+    """
+    Render the PDF report of 'dataset' into 'output'; see
+    report_builder.build_report. reportlab is only imported on first use.
+    """
+    from .report_builder import build_report
+    build_report(dataset, output, username, generated_at=generated_at, rows=rows)
+
+
+def cached_report_path(dataset, username):
+    """
+    Path of the cached report for 'dataset', or None if the dataset has no
+    on-disk store to keep it in.
+    """
+    if not dataset.storage_path:
+        return None
+    return os.path.join(
+        storage_dir(dataset.storage_path),
+        f'report-{report_key(dataset, username)}.pdf'
+    )
+
+
+def ensure_cached_report(dataset, username):
+    """
+    Return the path of the cached report, rendering it first if needed.
+    Returns None when the dataset cannot hold a cached report.
+    """
+    path = cached_report_path(dataset, username)
+    if path is None or os.path.exists(path):
+        return path
+
+    # Render next to the final path and rename, so readers never see a
+    # partially written file
+    fd, tmp_path = tempfile.mkstemp(suffix='.pdf.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            build_report(dataset, handle, username)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _discard_file(tmp_path)
+        raise
+
+    # Drop reports rendered under an older key (e.g. before a re-upload)
+    directory = os.path.dirname(path)
+    for entry in os.listdir(directory):
+        if entry.startswith('report-') and entry.endswith('.pdf') and entry != os.path.basename(path):
+            try:
+                os.remove(os.path.join(directory, entry))
+            except FileNotFoundError:
+                pass
+    return path
+
+
+def render_report(dataset_id, username):
+    """
+    Render a dataset's report; runs inside a render worker.
+    Returns (path, None) for a cached report, or (None, pdf bytes) for a
+    dataset without an on-disk store.
+    """
+    dataset = Dataset.objects.get(id=dataset_id)
+    path = ensure_cached_report(dataset, username)
+    if path is not None:
+        return path, None
+    buffer = io.BytesIO()
+    build_report(dataset, buffer, username)
+    return None, buffer.getvalue()
+
+
+def _get_render_slots():
+    global _render_slots
+    with _render_slots_lock:
+        if _render_slots is None:
+            _render_slots = HostSlots(settings.PDF_RENDER_SLOTS_DIR, settings.PDF_RENDER_QUEUE_LIMIT)
+        return _render_slots
+
+
+def render_detailed_report(dataset_id, username, path):
+    """
+    Render the full-detail report, appendix included, into the file at
+    'path'; runs inside a render worker.
+    """
+    dataset = Dataset.objects.get(id=dataset_id)
+    with open(path, 'wb') as handle:
+        build_report(dataset, handle, username, rows=dataset.open_rows())
+    return path
+
+
+def _discard_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _abandoned(release, on_abandon):
+    release()
+    if on_abandon is not None:
+        on_abandon()
+
+
+def _run_pooled(task, args, timeout, on_abandon=None):
+    """
+    Run 'task' (a dotted path) on the render pool and wait for its result.
+
+    At most PDF_RENDER_QUEUE_LIMIT tasks on the host, across all web
+    processes, hold a render slot; further requests wait up to
+    PDF_RENDER_QUEUE_TIMEOUT seconds for one and the task gets 'timeout'
+    seconds. Raises RenderBusy when either runs out. A task abandoned after
+    its timeout keeps its slot until it finishes, then calls 'on_abandon'.
+    """
+    release = _get_render_slots().acquire(settings.PDF_RENDER_QUEUE_TIMEOUT)
+    if release is None:
+        raise RenderBusy('Too many reports are being generated, try again later')
+    release_when_done = False
+    try:
+        future = report_pool.submit(task, *args)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            if not future.cancel():
+                release_when_done = True
+                future.add_done_callback(lambda _: _abandoned(release, on_abandon))
+            raise RenderBusy('Report generation timed out, try again later')
+    finally:
+        if not release_when_done:
+            release()
+
+
+def render_report_pooled(dataset, username):
+    """
+    Render a report on the render pool and wait for it, as render_report.
+    With PDF_RENDER_WORKERS = 0 reports render inline.
+    """
+    with phase('pdf'), PDF_RENDER_SECONDS.labels(kind='summary').time():
+        if not settings.PDF_RENDER_WORKERS:
+            return render_report(dataset.id, username)
+        return _run_pooled(
+            'api.reports.render_report', (dataset.id, username),
+            settings.PDF_RENDER_TIMEOUT
+        )
+
+
+def render_detailed_report_pooled(dataset, username):
+    """
+    Render the full-detail report into a new temporary file on the render
+    pool and return its path. The caller owns (and must remove) the file.
+    """
+    fd, path = tempfile.mkstemp(prefix='report-detailed-', suffix='.pdf')
+    os.close(fd)
+    try:
+        with phase('pdf'), PDF_RENDER_SECONDS.labels(kind='detailed').time():
+            if not settings.PDF_RENDER_WORKERS:
+                return render_detailed_report(dataset.id, username, path)
+            return _run_pooled(
+                'api.reports.render_detailed_report', (dataset.id, username, path),
+                settings.PDF_DETAILED_RENDER_TIMEOUT,
+                on_abandon=lambda: _discard_file(path)
+            )
+    except BaseException:
+        _discard_file(path)
+        raise
+
+
+def _log_render_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error('Background report render failed: %s', future.exception())
+
+
+def prerender_report(dataset, username):
+    """
+    Warm the report cache for a freshly uploaded dataset without waiting.
+    Inside a worker process (e.g. an async upload job) it renders inline.
+    """
+    if settings.PDF_RENDER_WORKERS and multiprocessing.parent_process() is None:
+        future = report_pool.submit('api.reports.render_report', dataset.id, username)
+        future.add_done_callback(_log_render_failure)
+    else:
+        ensure_cached_report(dataset, username)
@@ -42,5 +42,7 @@ class SummarySerializer(serializers.Serializer):
     total_equipment = serializers.IntegerField()
     average_values = serializers.DictField()
     type_distribution = serializers.DictField()
+    percentiles = serializers.DictField(required=False)
+    type_statistics = serializers.DictField(required=False)
     upload_date = serializers.DateTimeField(required=False)
     dataset_name = serializers.CharField(required=False)
\ No newline at end of file
@@ -0,0 +1,249 @@
+"""
+Mergeable quantile sketches for the numeric columns of a dataset.
+
+Exact percentiles need every value of a column at once, which the chunked
+ingest path never has. Instead each chunk is fed into a KLL sketch (Karnin,
+Lang & Liberty, "Optimal Quantile Approximation in Streams", 2016): a stack
+of compactors where level h holds items of weight 2**h. When a level
+outgrows its capacity it is sorted and every other item (starting at a
+random offset) is promoted to the next level, halving its size while
+keeping the total weight.
+
+Error bounds: for a sketch with parameter k the returned quantile has a
+*rank* error of roughly 1.7/k of the number of values with 99% probability,
+independent of how many values were added or how sketches were merged. With
+the default k=200 that is about 1.7%: the reported p95 lies between the true
+p93.3 and p96.7. A sketch holding at most k values is exact, as are the
+reported minimum and maximum. A sketch retains at most about 3k values.
+
+Sketches are kept per numeric column, overall and per equipment Type, with
+the same layout as the statistics in stats.py:
+
+    {'overall': {'flowrate': {...}, ...}, 'by_type': {'Pump': {...}, ...}}
+"""
+
+import base64
+import math
+import os
+
+import numpy as np
+
+from .stats import percentile_key
+from .storage import NUMERIC_FIELDS
+
+
+DEFAULT_K = 200
+# Capacity of each level relative to the one above it
+CAPACITY_DECAY = 2 / 3
+MIN_CAPACITY = 2
+# Percentiles reported by the summary and aggregate endpoints
+REPORTED_PERCENTILES = [50, 95, 99]
+
+_rng = np.random.default_rng()
+
+
+def _reseed():
+    global _rng
+    _rng = np.random.default_rng()
+
+
+# Processes forked after import (gunicorn workers with preload_app) would
+# otherwise all draw the same compaction offsets
+os.register_at_fork(after_in_child=_reseed)
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch over float values. NaN values are ignored.
+    """
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.n = 0
+        self.min = None
+        self.max = None
+        self.levels = [np.empty(0, dtype=np.float64)]
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(MIN_CAPACITY, int(math.ceil(self.k * CAPACITY_DECAY ** depth)))
+
+    def _compress(self):
+        # Lazy compaction: only compact while the sketch as a whole is over
+        # capacity, always starting with the lowest overfull level
+        while sum(map(len, self.levels)) > sum(map(self._capacity, range(len(self.levels)))):
+            level = next(
+                level for level, items in enumerate(self.levels)
+                if len(items) > self._capacity(level)
+            )
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0, dtype=np.float64))
+            items = np.sort(self.levels[level])
+            # An odd item out stays behind so the promoted half is exact
+            leftover, items = items[:len(items) % 2], items[len(items) % 2:]
+            promoted = items[_rng.integers(2)::2]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            self.levels[level] = leftover
+
+    def update(self, values):
+        """
+        Add an array of values.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """
+        Fold 'other' into this sketch. Both should share the same k.
+        """
+        if not other.n:
+            return
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+
+    def quantiles(self, fractions):
+        """
+        Approximate values at the given fractions (0..1), None if empty.
+        """
+        if not self.n:
+            return [None] * len(fractions)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(level_items), 2 ** level, dtype=np.float64)
+            for level, level_items in enumerate(self.levels)
+        ])
+        order = np.argsort(items, kind='stable')
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+        targets = np.asarray(fractions, dtype=np.float64) * cumulative[-1]
+        positions = np.searchsorted(cumulative, targets, side='left').clip(0, len(items) - 1)
+        values = np.clip(items[positions], self.min, self.max)
+        values = np.where(np.asarray(fractions) <= 0, self.min, values)
+        values = np.where(np.asarray(fractions) >= 1, self.max, values)
+        return [float(value) for value in values]
+
+    def to_dict(self):
+        return {
+            'k': self.k,
+            'n': self.n,
+            'min': self.min,
+            'max': self.max,
+            'levels': [len(items) for items in self.levels],
+            'items': base64.b64encode(np.concatenate(self.levels).astype('<f8').tobytes()).decode('ascii'),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['k'])
+        sketch.n = data['n']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        items = np.frombuffer(base64.b64decode(data['items']), dtype='<f8').astype(np.float64)
+        bounds = np.cumsum([0] + data['levels'])
+        sketch.levels = [items[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+        return sketch
+
+
+class SketchSet:
+    """
+    KLL sketches of every numeric column, overall and per Type.
+    """
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.overall = {field: KLLSketch(k) for field in NUMERIC_FIELDS.values()}
+        self.by_type = {}
+
+    def update(self, grouped):
+        """
+        Add the values of a chunk grouped by stats.group_frame.
+        """
+        import pandas as pd
+
+        frame = grouped.obj
+        for column, field in NUMERIC_FIELDS.items():
+            values = frame[column].to_numpy()
+            self.overall[field].update(values)
+            for eq_type, indices in grouped.indices.items():
+                if pd.isna(eq_type):
+                    continue
+                columns = self.by_type.setdefault(
+                    str(eq_type), {name: KLLSketch(self.k) for name in NUMERIC_FIELDS.values()}
+                )
+                columns[field].update(values[indices])
+
+    def merge(self, other):
+        """
+        Fold another SketchSet into this one.
+        """
+        for field, sketch in other.overall.items():
+            self.overall[field].merge(sketch)
+        for eq_type, columns in other.by_type.items():
+            mine = self.by_type.setdefault(
+                eq_type, {name: KLLSketch(self.k) for name in NUMERIC_FIELDS.values()}
+            )
+            for field, sketch in columns.items():
+                mine[field].merge(sketch)
+
+    @staticmethod
+    def _percentiles(columns, percentiles):
+        fractions = [percentile / 100 for percentile in percentiles]
+        return {
+            field: dict(zip(map(percentile_key, percentiles), sketch.quantiles(fractions)))
+            for field, sketch in columns.items()
+        }
+
+    def column_percentiles(self, percentiles=REPORTED_PERCENTILES):
+        """
+        Approximate percentiles of each column: {field: {'p50': ..., ...}}.
+        """
+        return self._percentiles(self.overall, percentiles)
+
+    def type_percentiles(self, percentiles=REPORTED_PERCENTILES):
+        """
+        Approximate percentiles per Type: {type: {field: {'p50': ..., ...}}}.
+        """
+        return {
+            eq_type: self._percentiles(columns, percentiles)
+            for eq_type, columns in self.by_type.items()
+        }
+
+    def to_dict(self):
+        return {
+            'overall': {field: sketch.to_dict() for field, sketch in self.overall.items()},
+            'by_type': {
+                eq_type: {field: sketch.to_dict() for field, sketch in columns.items()}
+                for eq_type, columns in self.by_type.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild a SketchSet stored with to_dict; an empty dict gives an empty set.
+        """
+        sketches = cls()
+        for field, sketch in data.get('overall', {}).items():
+            sketches.overall[field] = KLLSketch.from_dict(sketch)
+        for eq_type, columns in data.get('by_type', {}).items():
+            sketches.by_type[eq_type] = {
+                field: KLLSketch.from_dict(sketch) for field, sketch in columns.items()
+            }
+        return sketches
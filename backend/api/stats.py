@@ -0,0 +1,268 @@
+"""
+Mergeable sufficient statistics for the numeric columns of a dataset.
+
+For every numeric column we keep count, sum, sum of squares, min, max and the
+number of missing values, once over the whole dataset and once per equipment
+Type:
+
+    {
+        'overall': {'flowrate': {...}, 'pressure': {...}, 'temperature': {...}},
+        'by_type': {'Pump': {'flowrate': {...}, ...}, ...},
+    }
+
+Two such blocks combine exactly with merge_stats, so means and variances over
+any set of datasets (or chunks of one upload) are computed from the stored
+statistics without touching the rows again. Rows without a Type count towards
+'overall' only, matching type_distribution.
+"""
+
+import math
+
+import numpy as np
+
+from .storage import NUMERIC_FIELDS
+
+
+STAT_KEYS = ['count', 'sum', 'sumsq', 'min', 'max', 'nulls']
+# Percentiles reported per Type (see type_statistics)
+PERCENTILES = [25, 50, 75, 95]
+
+
+def empty_column_stats():
+    return {'count': 0, 'sum': 0.0, 'sumsq': 0.0, 'min': None, 'max': None, 'nulls': 0}
+
+
+def empty_stats():
+    return {
+        'overall': {field: empty_column_stats() for field in NUMERIC_FIELDS.values()},
+        'by_type': {},
+    }
+
+
+def _merge_bound(a, b, pick):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return pick(a, b)
+
+
+def merge_column_stats(a, b):
+    """
+    Combine the statistics of two disjoint sets of values of one column.
+    """
+    return {
+        'count': a['count'] + b['count'],
+        'sum': a['sum'] + b['sum'],
+        'sumsq': a['sumsq'] + b['sumsq'],
+        'min': _merge_bound(a['min'], b['min'], min),
+        'max': _merge_bound(a['max'], b['max'], max),
+        'nulls': a['nulls'] + b['nulls'],
+    }
+
+
+def _merge_columns(a, b):
+    merged = dict(a)
+    for field, column in b.items():
+        merged[field] = merge_column_stats(merged[field], column) if field in merged else dict(column)
+    return merged
+
+
+def merge_stats(a, b):
+    """
+    Combine two statistics blocks (see module docstring) into a new one.
+    """
+    by_type = dict(a.get('by_type', {}))
+    for eq_type, columns in b.get('by_type', {}).items():
+        by_type[eq_type] = _merge_columns(by_type[eq_type], columns) if eq_type in by_type else columns
+    return {
+        'overall': _merge_columns(a.get('overall', {}), b.get('overall', {})),
+        'by_type': by_type,
+    }
+
+
+def _is_missing(value):
+    # Only called on values pandas produced, so the import is a lookup
+    import pandas as pd
+    return pd.isna(value)
+
+
+def _optional(value):
+    return None if _is_missing(value) else float(value)
+
+
+def percentile_key(percentile):
+    return f'p{percentile:g}'
+
+
+def group_frame(df):
+    """
+    Numeric columns of a DataFrame (plus their squares) grouped by Type,
+    missing Types included. One grouping serves every per-Type aggregate.
+    """
+    import pandas as pd
+
+    values = pd.DataFrame(
+        {column: pd.to_numeric(df[column]) for column in NUMERIC_FIELDS},
+        index=df.index, dtype=np.float64,
+    )
+    # Square once so sums of squares come out of the same groupby as the rest
+    squares = (values ** 2).add_suffix(' sumsq')
+    frame = pd.concat([values, squares], axis=1)
+    # observed=True: a categorical Type only groups the values it holds
+    return frame.groupby(df['Type'], dropna=False, sort=False, observed=True)
+
+
+def grouped_stats(grouped):
+    """
+    Statistics block from the result of group_frame.
+    """
+    sums = grouped.sum()
+    counts = grouped[list(NUMERIC_FIELDS)].count()
+    mins = grouped[list(NUMERIC_FIELDS)].min()
+    maxs = grouped[list(NUMERIC_FIELDS)].max()
+    sizes = grouped.size()
+
+    stats = empty_stats()
+    for eq_type in sizes.index:
+        columns = {}
+        for column, field in NUMERIC_FIELDS.items():
+            count = int(counts.at[eq_type, column])
+            columns[field] = {
+                'count': count,
+                'sum': float(sums.at[eq_type, column]),
+                'sumsq': float(sums.at[eq_type, f'{column} sumsq']),
+                'min': _optional(mins.at[eq_type, column]),
+                'max': _optional(maxs.at[eq_type, column]),
+                'nulls': int(sizes.at[eq_type]) - count,
+            }
+        stats['overall'] = _merge_columns(stats['overall'], columns)
+        if not _is_missing(eq_type):
+            stats['by_type'][str(eq_type)] = columns
+    return stats
+
+
+def grouped_percentiles(grouped, percentiles=PERCENTILES):
+    """
+    Exact per-Type percentiles from the result of group_frame:
+    {type: {field: {'p50': ..., ...}}}.
+    """
+    quantiles = grouped[list(NUMERIC_FIELDS)].quantile([p / 100 for p in percentiles])
+    result = {}
+    for (eq_type, quantile), row in quantiles.iterrows():
+        if _is_missing(eq_type):
+            continue
+        columns = result.setdefault(str(eq_type), {field: {} for field in NUMERIC_FIELDS.values()})
+        for column, field in NUMERIC_FIELDS.items():
+            columns[field][percentile_key(quantile * 100)] = _optional(row[column])
+    return result
+
+
+def frame_stats(df):
+    """
+    Statistics block for a DataFrame with the CSV column names, computed in
+    a single grouped aggregation over all numeric columns.
+    """
+    return grouped_stats(group_frame(df))
+
+
+def rows_stats(rows, chunk_rows, sketches=None):
+    """
+    Statistics block for a stored ColumnarDataset, read 'chunk_rows' at a time.
+    Each chunk is also fed to 'sketches' (a sketches.SketchSet) if given.
+    Used to backfill datasets uploaded before statistics were recorded.
+    """
+    import pandas as pd
+
+    stats = empty_stats()
+    for start in range(0, len(rows), chunk_rows):
+        stop = start + chunk_rows
+        chunk = pd.DataFrame({'Type': rows.decoded('Type', start, stop)})
+        for column in NUMERIC_FIELDS:
+            chunk[column] = np.asarray(rows.numeric(column)[start:stop])
+        grouped = group_frame(chunk)
+        stats = merge_stats(stats, grouped_stats(grouped))
+        if sketches is not None:
+            sketches.update(grouped)
+    return stats
+
+
+def mean(column):
+    if not column['count']:
+        return None
+    return column['sum'] / column['count']
+
+
+def variance(column, ddof=1):
+    """
+    Variance from count, sum and sum of squares; None with too few values.
+    """
+    count = column['count']
+    if count <= ddof:
+        return None
+    centered = column['sumsq'] - column['sum'] ** 2 / count
+    # Guard against tiny negative results from floating point cancellation
+    return max(centered, 0.0) / (count - ddof)
+
+
+def std(column, ddof=1):
+    value = variance(column, ddof)
+    return None if value is None else math.sqrt(value)
+
+
+def describe(column):
+    """
+    Count, missing values, mean, sample standard deviation, min and max of
+    one column's statistics.
+    """
+    return {
+        'count': column['count'],
+        'nulls': column['nulls'],
+        'mean': mean(column),
+        'std': std(column),
+        'min': column['min'],
+        'max': column['max'],
+    }
+
+
+def describe_stats(stats, sketches=None):
+    """
+    Describe every column of a statistics block, overall and per Type.
+    With 'sketches' (a sketches.SketchSet) each column also gets its
+    approximate percentiles.
+    """
+    result = {
+        'columns': {field: describe(column) for field, column in stats['overall'].items()},
+        'by_type': {
+            eq_type: {field: describe(column) for field, column in columns.items()}
+            for eq_type, columns in stats['by_type'].items()
+        },
+    }
+    if sketches is not None:
+        for field, values in sketches.column_percentiles().items():
+            result['columns'][field].update(values)
+        for eq_type, columns in sketches.type_percentiles().items():
+            for field, values in columns.items():
+                if eq_type in result['by_type']:
+                    result['by_type'][eq_type][field].update(values)
+    return result
+
+
+def type_statistics(stats, percentiles=None):
+    """
+    Per-Type count, mean, std, min, max and percentiles of every numeric
+    column: {type: {field: {...}}}. 'percentiles' is the result of
+    grouped_percentiles; percentiles it does not cover are None.
+    """
+    percentiles = percentiles or {}
+    result = {}
+    for eq_type, columns in stats['by_type'].items():
+        result[eq_type] = {}
+        for field, column in columns.items():
+            values = percentiles.get(eq_type, {}).get(field, {})
+            entry = describe(column)
+            for percentile in PERCENTILES:
+                key = percentile_key(percentile)
+                entry[key] = values.get(key)
+            result[eq_type][field] = entry
+    return result
@@ -0,0 +1,279 @@
+"""
+Columnar on-disk storage for the equipment rows of each dataset.
+
+Every dataset gets its own directory under DATASET_STORE_ROOT holding one raw
+binary file per column, so rows can be memory-mapped for later queries
+instead of re-parsing the CSV:
+
+    meta.json                     row count and column layout
+    flowrate.bin                  float64 values
+    pressure.bin                  float64 values
+    temperature.bin               float64 values
+    type.bin                      int32 codes into type.categories.npy
+    equipment_name.text.bin       UTF-8 names, concatenated
+    equipment_name.ends.bin       int64 end offset of each row's name in the text
+    equipment_name.nulls.bin      uint8, 1 where the name is missing
+    anomalies.*                   flagged rows and their scores (see anomalies.py)
+    report-<key>.pdf              cached PDF report (see reports.py)
+
+Categorical codes of -1 mark missing values. Only low-cardinality columns
+(Type) are dictionary-encoded: equipment names are usually unique per row,
+so a dictionary of them would grow with the dataset while it is written.
+"""
+
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+from django.conf import settings
+
+
+NUMERIC_FIELDS = {
+    'Flowrate': 'flowrate',
+    'Pressure': 'pressure',
+    'Temperature': 'temperature',
+}
+CATEGORICAL_FIELDS = {
+    'Type': 'type',
+}
+TEXT_FIELDS = {
+    'Equipment Name': 'equipment_name',
+}
+COLUMN_ORDER = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+
+NUMERIC_DTYPE = np.float64
+CODE_DTYPE = np.int32
+OFFSET_DTYPE = np.int64
+META_FILE = 'meta.json'
+
+
+def store_root():
+    return settings.DATASET_STORE_ROOT
+
+
+def storage_dir(storage_path):
+    return os.path.join(store_root(), storage_path)
+
+
+def remove_storage(storage_path):
+    """
+    Delete the on-disk rows of a dataset. Missing directories are ignored.
+    """
+    if storage_path:
+        shutil.rmtree(storage_dir(storage_path), ignore_errors=True)
+
+
+class ColumnarWriter:
+    """
+    Appends DataFrame chunks to a new columnar store.
+
+    Use as a context manager: the store is finalised on a clean exit and
+    removed again if an exception escapes, so a failed upload leaves nothing
+    behind.
+    """
+
+    def __init__(self):
+        self.storage_path = uuid.uuid4().hex
+        self.path = storage_dir(self.storage_path)
+        self.rows = 0
+        self._categories = {field: {} for field in CATEGORICAL_FIELDS.values()}
+        self._files = {}
+
+    def __enter__(self):
+        os.makedirs(self.path)
+        for field in list(NUMERIC_FIELDS.values()) + list(CATEGORICAL_FIELDS.values()):
+            self._files[field] = open(os.path.join(self.path, f'{field}.bin'), 'wb')
+        for field in TEXT_FIELDS.values():
+            for part in ('text', 'ends', 'nulls'):
+                self._files[f'{field}.{part}'] = open(os.path.join(self.path, f'{field}.{part}.bin'), 'wb')
+        self._text_bytes = {field: 0 for field in TEXT_FIELDS.values()}
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for handle in self._files.values():
+            handle.close()
+        if exc_type is None:
+            self._write_meta()
+        else:
+            remove_storage(self.storage_path)
+        return False
+
+    def _encode(self, field, series):
+        import pandas as pd
+
+        codes, uniques = pd.factorize(series)
+        lookup = self._categories[field]
+        mapping = np.empty(len(uniques) + 1, dtype=CODE_DTYPE)
+        mapping[-1] = -1
+        for local_code, value in enumerate(uniques):
+            mapping[local_code] = lookup.setdefault(str(value), len(lookup))
+        # factorize marks missing values with -1, which indexes the sentinel
+        return mapping[codes]
+
+    def _append_text(self, field, series):
+        # Only the current chunk's names are held in memory
+        missing = series.isna().to_numpy()
+        encoded = [
+            b'' if is_missing else str(value).encode('utf-8')
+            for value, is_missing in zip(series.tolist(), missing)
+        ]
+        ends = self._text_bytes[field] + np.cumsum(
+            np.fromiter(map(len, encoded), dtype=OFFSET_DTYPE, count=len(encoded))
+        )
+        if len(ends):
+            self._text_bytes[field] = int(ends[-1])
+        self._files[f'{field}.text'].write(b''.join(encoded))
+        self._files[f'{field}.ends'].write(ends.astype(OFFSET_DTYPE).tobytes())
+        self._files[f'{field}.nulls'].write(missing.astype(np.uint8).tobytes())
+
+    def append(self, chunk):
+        import pandas as pd
+
+        for column, field in NUMERIC_FIELDS.items():
+            values = pd.to_numeric(chunk[column]).to_numpy(dtype=NUMERIC_DTYPE, na_value=np.nan)
+            self._files[field].write(values.tobytes())
+        for column, field in CATEGORICAL_FIELDS.items():
+            self._files[field].write(self._encode(field, chunk[column]).tobytes())
+        for column, field in TEXT_FIELDS.items():
+            self._append_text(field, chunk[column])
+        self.rows += len(chunk)
+
+    def _write_meta(self):
+        for field, lookup in self._categories.items():
+            categories = np.array(list(lookup), dtype=str)
+            np.save(os.path.join(self.path, f'{field}.categories.npy'), categories)
+        meta = {
+            'rows': self.rows,
+            'numeric': NUMERIC_FIELDS,
+            'categorical': CATEGORICAL_FIELDS,
+            'text': TEXT_FIELDS,
+        }
+        with open(os.path.join(self.path, META_FILE), 'w') as handle:
+            json.dump(meta, handle)
+
+
+class ColumnarDataset:
+    """
+    Read-only, memory-mapped view over a dataset's stored rows.
+    """
+
+    def __init__(self, storage_path):
+        self.path = storage_dir(storage_path)
+        with open(os.path.join(self.path, META_FILE)) as handle:
+            self.meta = json.load(handle)
+        self.rows = self.meta['rows']
+        self._arrays = {}
+        self._texts = {}
+
+    def __len__(self):
+        return self.rows
+
+    def _map(self, field, dtype):
+        if field not in self._arrays:
+            if self.rows:
+                self._arrays[field] = np.memmap(
+                    os.path.join(self.path, f'{field}.bin'),
+                    dtype=dtype, mode='r', shape=(self.rows,)
+                )
+            else:
+                self._arrays[field] = np.empty(0, dtype=dtype)
+        return self._arrays[field]
+
+    def _text(self, field):
+        if field not in self._texts:
+            path = os.path.join(self.path, f'{field}.text.bin')
+            if os.path.getsize(path):
+                self._texts[field] = np.memmap(path, dtype=np.uint8, mode='r')
+            else:
+                self._texts[field] = np.empty(0, dtype=np.uint8)
+        return self._texts[field]
+
+    def numeric(self, column):
+        """
+        Memory-mapped float64 values of a numeric CSV column.
+        """
+        return self._map(NUMERIC_FIELDS[column], NUMERIC_DTYPE)
+
+    def codes(self, column):
+        """
+        Memory-mapped int32 dictionary codes of a categorical CSV column.
+        """
+        return self._map(CATEGORICAL_FIELDS[column], CODE_DTYPE)
+
+    def categories(self, column):
+        """
+        Dictionary of a categorical CSV column, indexed by code.
+        """
+        field = CATEGORICAL_FIELDS[column]
+        key = f'{field}.categories'
+        if key not in self._arrays:
+            self._arrays[key] = np.load(os.path.join(self.path, f'{key}.npy'), mmap_mode='r')
+        return self._arrays[key]
+
+    def _decode_text(self, column, selection):
+        field = self.meta['text'][column]
+        ends = self._map(f'{field}.ends', OFFSET_DTYPE)
+        if isinstance(selection, slice):
+            positions = np.arange(*selection.indices(self.rows))
+        else:
+            positions = np.asarray(selection, dtype=np.int64)
+        stops = np.asarray(ends[positions])
+        starts = np.where(positions > 0, np.asarray(ends[np.maximum(positions - 1, 0)]), 0)
+        missing = np.asarray(self._map(f'{field}.nulls', np.uint8)[positions]).astype(bool)
+        text = self._text(field)
+        values = np.empty(len(positions), dtype=object)
+        for i, (start, stop) in enumerate(zip(starts.tolist(), stops.tolist())):
+            if not missing[i]:
+                values[i] = text[start:stop].tobytes().decode('utf-8')
+        return values
+
+    def _decode(self, column, selection):
+        if column in self.meta['text']:
+            return self._decode_text(column, selection)
+        codes = np.asarray(self.codes(column)[selection])
+        categories = self.categories(column)
+        values = np.empty(len(codes), dtype=object)
+        present = codes >= 0
+        values[present] = categories[codes[present]]
+        return values
+
+    def decoded(self, column, start=0, stop=None):
+        """
+        Values of a categorical or text column for rows [start, stop), None
+        if missing.
+        """
+        return self._decode(column, slice(start, stop))
+
+    def _records(self, selection):
+        columns = {}
+        for column in list(CATEGORICAL_FIELDS) + list(TEXT_FIELDS):
+            columns[column] = [
+                None if value is None else str(value)
+                for value in self._decode(column, selection)
+            ]
+        for column in NUMERIC_FIELDS:
+            values = np.asarray(self.numeric(column)[selection])
+            columns[column] = [
+                None if np.isnan(value) else value
+                for value in values.tolist()
+            ]
+        count = len(columns['Type'])
+        return [
+            {column: columns[column][i] for column in COLUMN_ORDER}
+            for i in range(count)
+        ]
+
+    def records(self, start=0, stop=None):
+        """
+        Rows [start, stop) as dicts keyed by the original CSV column names.
+        Missing values are returned as None.
+        """
+        return self._records(slice(start, stop))
+
+    def records_at(self, indexes):
+        """
+        Rows at the given positions, in the same form as records().
+        """
+        return self._records(np.asarray(indexes, dtype=np.int64))
@@ -0,0 +1,289 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import sketches
+from .models import Dataset
+from .sketches import DEFAULT_K, KLLSketch
+from .stats import empty_stats, frame_stats, mean, merge_stats, variance
+from .storage import NUMERIC_FIELDS, storage_dir
+from .views import _free_username
+
+
+CSV = (
+    b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+    b"P1,Pump,10,5,100\n"
+    b"P2,Pump,20,6,110\n"
+    b"V1,Valve,30,7,120\n"
+    b"R1,Reactor,1,2,3\n"
+)
+
+
+class APITestCase(TestCase):
+    """
+    Runs every test against its own dataset store and an in-memory cache,
+    with reports rendered inline.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        overrides = override_settings(
+            MEDIA_ROOT=media_root,
+            DATASET_STORE_ROOT=f'{media_root}/datasets',
+            UPLOAD_JOB_SPOOL_ROOT=f'{media_root}/upload_jobs',
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            PDF_RENDER_WORKERS=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.user = User.objects.create_user('tester', 'tester@example.com', 'pw-12345678')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post_csv(self, data=CSV, **params):
+        return self.client.post(
+            '/api/upload/',
+            {'file': SimpleUploadedFile('equipment.csv', data, content_type='text/csv'), **params},
+            format='multipart'
+        )
+
+    def upload(self, data=CSV, **params):
+        response = self.post_csv(data, **params)
+        self.assertEqual(response.status_code, 201)
+        return response.json()['dataset_id']
+
+
+class UploadValidationTests(APITestCase):
+
+    def assertRejected(self, data, message, **params):
+        response = self.post_csv(data, **params)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], message)
+        self.assertFalse(Dataset.objects.exists())
+
+    def test_header_only_file_is_empty(self):
+        self.assertRejected(CSV.split(b'\n')[0] + b'\n', 'CSV file is empty')
+
+    def test_header_only_file_is_empty_when_streamed(self):
+        self.assertRejected(CSV.split(b'\n')[0] + b'\n', 'CSV file is empty', stream='1')
+
+    def test_file_that_is_not_utf8_is_rejected(self):
+        data = CSV.replace(b'P2', b'P\xe9')
+        self.assertRejected(data, 'CSV file must be UTF-8 encoded')
+        self.assertRejected(data, 'CSV file must be UTF-8 encoded', stream='1')
+
+    def test_column_without_values_is_rejected(self):
+        data = CSV.replace(b',5,', b',,').replace(b',6,', b',,').replace(b',7,', b',,').replace(b',2,', b',,')
+        self.assertRejected(data, 'Column Pressure has no values')
+        self.assertRejected(data, 'Column Pressure has no values', stream='1')
+
+
+class StatisticsTests(TestCase):
+
+    def test_merged_chunk_stats_match_a_single_pass(self):
+        rng = np.random.default_rng(7)
+        df = pd.DataFrame({
+            'Type': rng.choice(['Pump', 'Valve', 'Reactor'], 3000),
+            'Flowrate': rng.normal(100, 15, 3000),
+            'Pressure': rng.normal(5, 1, 3000),
+            'Temperature': rng.normal(300, 40, 3000),
+        })
+        merged = empty_stats()
+        for start in range(0, len(df), 700):
+            merged = merge_stats(merged, frame_stats(df.iloc[start:start + 700]))
+
+        for column, field in NUMERIC_FIELDS.items():
+            values = df[column]
+            overall = merged['overall'][field]
+            self.assertEqual(overall['count'], len(values))
+            self.assertAlmostEqual(mean(overall), values.mean(), places=9)
+            self.assertAlmostEqual(variance(overall), values.var(ddof=1), places=6)
+            self.assertEqual((overall['min'], overall['max']), (values.min(), values.max()))
+            for eq_type, group in df.groupby('Type'):
+                self.assertAlmostEqual(
+                    variance(merged['by_type'][eq_type][field]), group[column].var(ddof=1), places=6
+                )
+
+    def test_kll_rank_error_within_bound(self):
+        # Values 0..n-1 in random order, so a value is its own rank
+        n = 200000
+        values = np.random.default_rng(3).permutation(n).astype(np.float64)
+        # Fixed compaction offsets, so the test does not rest on the 1% tail
+        self.addCleanup(setattr, sketches, '_rng', sketches._rng)
+        sketches._rng = np.random.default_rng(11)
+        first, second = KLLSketch(), KLLSketch()
+        for start in range(0, n // 2, 1000):
+            first.update(values[start:start + 1000])
+        second.update(values[n // 2:])
+        first.merge(second)
+
+        fractions = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+        bound = 1.7 / DEFAULT_K
+        for fraction, value in zip(fractions, first.quantiles(fractions)):
+            self.assertLessEqual(abs(value / n - fraction), bound, f'quantile {fraction}')
+        self.assertEqual(first.quantiles([0, 1]), [0.0, n - 1.0])
+        self.assertLessEqual(sum(map(len, first.levels)), 3 * DEFAULT_K)
+
+
+class AnomalyTests(APITestCase):
+
+    def test_outliers_are_flagged_per_type(self):
+        lines = [b'Equipment Name,Type,Flowrate,Pressure,Temperature']
+        for i in range(50):
+            lines.append(b'Pump-%d,Pump,%.1f,5,100' % (i, 10 + i % 5 * 0.1))
+            lines.append(b'Valve-%d,Valve,%.1f,5,100' % (i, 100 + i % 5 * 0.1))
+        # Ordinary values for the other Type, outliers for their own
+        lines.append(b'Pump-odd,Pump,100,5,100')
+        lines.append(b'Valve-odd,Valve,10,5,100')
+        dataset_id = self.upload(b'\n'.join(lines) + b'\n')
+
+        response = self.client.get(f'/api/datasets/{dataset_id}/anomalies/')
+        self.assertEqual(response.status_code, 200)
+        anomalies = response.json()['anomalies']
+        self.assertEqual(
+            sorted(entry['data']['Equipment Name'] for entry in anomalies), ['Pump-odd', 'Valve-odd']
+        )
+        for entry in anomalies:
+            self.assertEqual(entry['flags'], {'flowrate': ['zscore', 'iqr']})
+            self.assertGreater(abs(entry['scores']['flowrate']), 3)
+
+
+class FreeUsernameTests(TestCase):
+
+    def test_smallest_free_numbered_username(self):
+        for username in ['eng', 'eng2', 'eng4', 'engineer', 'eng3x', 'Eng3']:
+            User.objects.create_user(username)
+        self.assertEqual(_free_username('eng'), 'eng3')
+        self.assertEqual(_free_username('engine'), 'engine')
+
+
+class RetentionTests(APITestCase):
+
+    @override_settings(DATASET_RETENTION_LIMIT=3, DATASET_RETENTION_EVICTION='inline')
+    def test_oldest_datasets_and_their_rows_are_removed(self):
+        paths = {}
+        for index in range(5):
+            with self.captureOnCommitCallbacks(execute=True):
+                dataset_id = self.upload(CSV.replace(b'P1,', b'P1-%d,' % index))
+            paths[dataset_id] = storage_dir(Dataset.objects.get(id=dataset_id).storage_path)
+            self.assertTrue(os.path.isdir(paths[dataset_id]))
+
+        kept = sorted(Dataset.objects.filter(user=self.user).values_list('id', flat=True))
+        self.assertEqual(kept, sorted(paths)[-3:])
+        for dataset_id, path in paths.items():
+            self.assertEqual(os.path.isdir(path), dataset_id in kept)
+
+
+class SummaryConditionalTests(APITestCase):
+
+    def test_unchanged_summary_is_not_modified(self):
+        self.upload()
+        response = self.client.get('/api/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+
+        again = self.client.get('/api/summary/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], response['ETag'])
+        since = self.client.get('/api/summary/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+    def test_new_upload_changes_the_etag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload()
+        etag = self.client.get('/api/summary/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dataset_id = self.upload(CSV.replace(b'P1,', b'P9,'))
+        response = self.client.get('/api/summary/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['dataset_name'], Dataset.objects.get(id=dataset_id).name)
+
+
+class AuthUserCacheTests(APITestCase):
+    """
+    Warm JWT requests resolve the user from the cache, without querying the
+    user table.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.upload()
+        login = APIClient().post(
+            '/api/login/', {'email': 'tester@example.com', 'password': 'pw-12345678'}, format='json'
+        )
+        self.jwt_client = APIClient()
+        self.jwt_client.credentials(HTTP_AUTHORIZATION=f'Bearer {login.json()["access"]}')
+
+    def user_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.jwt_client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries.captured_queries if '"auth_user"' in query['sql']]
+
+    def test_warm_requests_do_not_query_users(self):
+        for path in ['/api/summary/', '/api/history/']:
+            with self.subTest(path=path):
+                self.user_queries(path)
+                self.assertEqual(self.user_queries(path), [])
+
+    def test_saved_user_is_read_again(self):
+        self.user_queries('/api/summary/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(len(self.user_queries('/api/summary/')), 1)
+        self.assertEqual(self.user_queries('/api/summary/'), [])
+
+
+class DetailedReportTests(APITestCase):
+
+    def get_detailed(self, dataset_id):
+        return self.client.get(f'/api/generate-pdf/{dataset_id}/', {'detailed': '1'})
+
+    @override_settings(PDF_DETAILED_MAX_ROWS=4)
+    def test_dataset_at_the_limit_is_rendered(self):
+        response = self.get_detailed(self.upload())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    @override_settings(PDF_DETAILED_MAX_ROWS=3)
+    def test_dataset_over_the_limit_is_refused(self):
+        response = self.get_detailed(self.upload())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('limited to 3 rows', response.json()['error'])
+
+
+class MetricsTests(TestCase):
+
+    @override_settings(DEBUG=False, METRICS_AUTH_TOKEN='')
+    def test_refused_without_token_when_not_debugging(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(DEBUG=True, METRICS_AUTH_TOKEN='')
+    def test_served_without_token_when_debugging(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(DEBUG=False, METRICS_AUTH_TOKEN='secret')
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(
+            self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401
+        )
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE', response.content)
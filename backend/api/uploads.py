@@ -0,0 +1,52 @@
+"""
+Upload handling helpers.
+"""
+
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Pass-through upload handler that computes the SHA-256 of each uploaded
+    file while Django streams it from the request body.
+
+    It must come before the handlers that store the file in
+    FILE_UPLOAD_HANDLERS. Digests are recorded on the request as
+    request.upload_digests[field_name].
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.request is not None:
+            if not hasattr(self.request, 'upload_digests'):
+                self.request.upload_digests = {}
+            self.request.upload_digests[self.field_name] = self.hasher.hexdigest()
+        # Let the next handler build the UploadedFile
+        return None
+
+
+def content_digest(request, field_name):
+    """
+    SHA-256 hex digest of an uploaded file. Uses the digest recorded by
+    HashingUploadHandler, falling back to hashing the stored upload if the
+    handler is not installed.
+    """
+    digests = getattr(request, 'upload_digests', None) or {}
+    if field_name in digests:
+        return digests[field_name]
+
+    uploaded = request.FILES[field_name]
+    hasher = hashlib.sha256()
+    for chunk in uploaded.chunks():
+        hasher.update(chunk)
+    uploaded.seek(0)
+    return hasher.hexdigest()
@@ -1,19 +1,37 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     UploadCSVView, 
     SummaryView, 
     HistoryView,
+    AggregateView,
     RegisterView,
     LoginView,
+    DatasetRowsView,
+    DatasetAnomaliesView,
+    JobStatusView,
     GeneratePDFReportView
 )
 
+if settings.ASYNC_ENDPOINTS:
+    # Coroutine variants for ASGI servers (see async_views.py)
+    from .async_views import generate_pdf_view, history_view, summary_view, upload_view
+else:
+    upload_view = UploadCSVView.as_view()
+    summary_view = SummaryView.as_view()
+    history_view = HistoryView.as_view()
+    generate_pdf_view = GeneratePDFReportView.as_view()
+
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
-    path('upload/', UploadCSVView.as_view(), name='upload-csv'),
-    path('summary/', SummaryView.as_view(), name='summary'),
-    path('history/', HistoryView.as_view(), name='history'),
-    path('generate-pdf/', GeneratePDFReportView.as_view(), name='generate-pdf'),
-    path('generate-pdf/<int:dataset_id>/', GeneratePDFReportView.as_view(), name='generate-pdf-id'),
+    path('upload/', upload_view, name='upload-csv'),
+    path('summary/', summary_view, name='summary'),
+    path('history/', history_view, name='history'),
+    path('aggregate/', AggregateView.as_view(), name='aggregate'),
+    path('datasets/<int:dataset_id>/rows/', DatasetRowsView.as_view(), name='dataset-rows'),
+    path('datasets/<int:dataset_id>/anomalies/', DatasetAnomaliesView.as_view(), name='dataset-anomalies'),
+    path('jobs/<uuid:job_id>/', JobStatusView.as_view(), name='job-status'),
+    path('generate-pdf/', generate_pdf_view, name='generate-pdf'),
+    path('generate-pdf/<int:dataset_id>/', generate_pdf_view, name='generate-pdf-id'),
 ]
\ No newline at end of file
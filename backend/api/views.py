@@ -4,21 +4,114 @@ from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.http import HttpResponse
-from django.db.models import Q
-import pandas as pd
-import io
-from .models import Dataset
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import http_date
+from .anomalies import FIELDS as ANOMALY_FIELDS
+from .caching import SUMMARY, user_cache_key
+from .ingest import CSVValidationError, create_dataset
+from .jobs import enqueue_upload, reap_stale_jobs
+from .metrics import record_cache, render_metrics
+from .models import Dataset, UploadJob
+from .profiling import phase
+from .uploads import content_digest
 from .serializers import DatasetSerializer, SummarySerializer, UserSerializer
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from datetime import datetime
+from .sketches import SketchSet
+from .stats import describe_stats, empty_stats, merge_stats
+from .reports import (
+    RenderBusy, cached_report_path, render_detailed_report_pooled, render_report_pooled, report_etag
+)
+import base64
+import hashlib
+import hmac
+import os
+import re
+import binascii
+import json
+
+
+def _flag(request, name):
+    """
+    Read a boolean option from the query string or form data.
+    """
+    value = request.query_params.get(name, request.data.get(name, ''))
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def _users_by_email(email):
+    """
+    Users whose email matches case-insensitively. Compares LOWER(email) so
+    the api_user_email_lower_idx index can be used.
+    """
+    return User.objects.alias(email_lower=Lower('email')).filter(email_lower=Lower(Value(email)))
+
+
+def _usernames_starting_with(base):
+    """
+    Usernames starting with 'base'. A prefix filter, so PostgreSQL can use
+    the varchar_pattern_ops index Django creates for auth_user.username.
+    """
+    return User.objects.filter(username__startswith=base).values_list('username', flat=True)
+
+
+def _free_username(base):
+    """
+    'base', or 'base' followed by the smallest free number from 2 up,
+    found with a single prefix query. Rows are streamed and only 'base' and
+    'base<digits>' are kept.
+    """
+    pattern = re.compile(rf'{re.escape(base)}[0-9]*')
+    taken = {
+        username for username in _usernames_starting_with(base).iterator()
+        if pattern.fullmatch(username)
+    }
+    if base not in taken:
+        return base
+    suffix = 2
+    while f"{base}{suffix}" in taken:
+        suffix += 1
+    return f"{base}{suffix}"
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def _dataset_summary(dataset):
+    """
+    Summary block shared by the upload and summary responses.
+    """
+    return {
+        'total_equipment': dataset.total_equipment,
+        'average_values': {
+            'flowrate': round(dataset.average_flowrate, 2),
+            'pressure': round(dataset.average_pressure, 2),
+            'temperature': round(dataset.average_temperature, 2)
+        },
+        'type_distribution': dataset.type_distribution,
+        # Approximate, from the dataset's quantile sketches
+        'percentiles': {
+            field: {key: _round(value) for key, value in values.items()}
+            for field, values in dataset.sketches().column_percentiles().items()
+        },
+        'type_statistics': {
+            eq_type: {
+                field: {
+                    key: value if key == 'count' else _round(value)
+                    for key, value in values.items()
+                }
+                for field, values in columns.items()
+            }
+            for eq_type, columns in dataset.type_statistics.items()
+        }
+    }
 
 
 class RegisterView(APIView):
@@ -39,21 +132,15 @@ class RegisterView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if User.objects.filter(email__iexact=email).exists():
+        if _users_by_email(email).exists():
             return Response(
                 {'error': 'Email already exists'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         if not username:
-            username = email.split('@')[0]
-            base = username
-            suffix = 1
-            while User.objects.filter(username=username).exists():
-                suffix += 1
-                username = f"{base}{suffix}"
-        
-        if User.objects.filter(username=username).exists():
+            username = _free_username(email.split('@')[0])
+        elif User.objects.filter(username=username).exists():
             return Response(
                 {'error': 'Username already exists'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -88,20 +175,21 @@ class LoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        matched = User.objects.filter(email__iexact=email)
-        if not matched.exists():
-            return Response(
-                {'error': 'Invalid credentials'},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-        if matched.count() > 1:
+        # One indexed query; a second match is enough to detect duplicates
+        matched = list(_users_by_email(email)[:2])
+        if len(matched) > 1:
             return Response(
                 {'error': 'Multiple accounts found for this email. Contact admin.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        user_obj = matched.first()
-        user = authenticate(username=user_obj.username, password=password)
+        # Same checks as ModelBackend, without fetching the user again
+        user = matched[0] if matched else None
+        if user is None:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            User().set_password(password)
+        elif not user.check_password(password) or not user.is_active:
+            user = None
         
         if user is None:
             return Response(
@@ -145,67 +233,80 @@ class UploadCSVView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            # Read CSV file using pandas
-            csv_data = csv_file.read().decode('utf-8')
-            df = pd.read_csv(io.StringIO(csv_data))
+        # Large files (or an explicit ?stream=1) are summarised chunk by chunk
+        # straight from the upload handle instead of being loaded whole
+        streaming = (
+            _flag(request, 'stream')
+            or csv_file.size > settings.CSV_STREAMING_THRESHOLD_BYTES
+        )
+        include_rows = not streaming and not _flag(request, 'summary_only')
+        
+        # Identical bytes already uploaded by this user: reuse that dataset
+        content_hash = content_digest(request, 'file')
+        existing = Dataset.objects.filter(user=request.user, content_hash=content_hash).first()
+        if existing:
+            # Re-uploading makes it the user's latest dataset again
+            existing.upload_timestamp = timezone.now()
+            existing.save(update_fields=['upload_timestamp'])
             
-            # Validate required columns
-            required_columns = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            response_data = {
+                'message': 'Identical CSV file already processed',
+                'dataset_id': existing.id,
+                'deduplicated': True,
+                'summary': _dataset_summary(existing)
+            }
+            rows = existing.open_rows()
+            if include_rows and rows is not None:
+                with phase('records'):
+                    response_data['equipment_data'] = rows.records()
             
-            if missing_columns:
-                return Response(
-                    {'error': f'Missing required columns: {", ".join(missing_columns)}'},
-                    status=status.HTTP_400_BAD_REQUEST
+            return Response(response_data, status=status.HTTP_200_OK)
+        
+        # ?async=1 queues the file for the worker pool and answers 202
+        if _flag(request, 'async'):
+            reap_stale_jobs()
+            if UploadJob.queue_is_full():
+                response = Response(
+                    {'error': 'Upload queue is full, try again later'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
                 )
+                response['Retry-After'] = '30'
+                return response
             
-            # Perform data analytics using Pandas
-            total_equipment = len(df)
-            
-            # Compute averages
-            average_flowrate = float(df['Flowrate'].mean())
-            average_pressure = float(df['Pressure'].mean())
-            average_temperature = float(df['Temperature'].mean())
-            
-            # Compute equipment type distribution
-            type_distribution = df['Type'].value_counts().to_dict()
-            
-            # Store dataset in database with user association
-            dataset = Dataset.objects.create(
-                user=request.user,
-                name=csv_file.name,
-                total_equipment=total_equipment,
-                average_flowrate=average_flowrate,
-                average_pressure=average_pressure,
-                average_temperature=average_temperature,
-                type_distribution=type_distribution
+            job = enqueue_upload(request.user, csv_file, content_hash)
+            return Response({
+                'message': 'CSV file accepted for processing',
+                'job_id': str(job.id),
+                'status': job.status,
+                'status_url': reverse('job-status', args=[job.id])
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        try:
+            dataset, df = create_dataset(
+                request.user, csv_file.name, csv_file,
+                content_hash=content_hash, streaming=streaming
             )
             
-            # Maintain only last 5 datasets per user
-            Dataset.maintain_limit_per_user(request.user, 5)
-            
             # Prepare response
             response_data = {
                 'message': 'CSV file uploaded and processed successfully',
                 'dataset_id': dataset.id,
-                'summary': {
-                    'total_equipment': total_equipment,
-                    'average_values': {
-                        'flowrate': round(average_flowrate, 2),
-                        'pressure': round(average_pressure, 2),
-                        'temperature': round(average_temperature, 2)
-                    },
-                    'type_distribution': type_distribution
-                },
-                'equipment_data': df.to_dict('records')
+                'deduplicated': False,
+                'summary': _dataset_summary(dataset)
             }
+            # ?summary_only=1 leaves the rows to /api/datasets/<id>/rows/
+            if include_rows:
+                with phase('records'):
+                    response_data['equipment_data'] = df.to_dict('records')
             
             return Response(response_data, status=status.HTTP_201_CREATED)
             
-        except pd.errors.EmptyDataError:
+        except CSVValidationError as e:
+            response_data = {'error': str(e)}
+            if e.invalid_rows:
+                response_data['invalid_rows'] = e.invalid_rows
             return Response(
-                {'error': 'CSV file is empty'},
+                response_data,
                 status=status.HTTP_400_BAD_REQUEST
             )
         except Exception as e:
@@ -223,29 +324,54 @@ class SummaryView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, *args, **kwargs):
-        # Get the most recent dataset for the authenticated user
-        latest_dataset = Dataset.objects.filter(user=request.user).first()
+        # Cached per user until the user's datasets change
+        cache_key = user_cache_key(SUMMARY, request.user.id)
+        entry = cache.get(cache_key)
+        record_cache('summary', entry is not None)
+        if entry is None:
+            entry = self.build_entry(request.user)
+            cache.set(cache_key, entry, settings.SUMMARY_CACHE_TIMEOUT)
         
-        if not latest_dataset:
+        if entry['data'] is None:
             return Response(
                 {'error': 'No datasets available'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
+        # Unchanged since the client's last poll
+        not_modified = get_conditional_response(
+            request, etag=entry['etag'], last_modified=entry['last_modified']
+        )
+        if not_modified is not None:
+            not_modified['ETag'] = entry['etag']
+            return not_modified
+        
+        response = Response(entry['data'], status=status.HTTP_200_OK)
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    def build_entry(self, user):
+        # Get the most recent dataset for the authenticated user
+        latest_dataset = Dataset.objects.filter(user=user).first()
+        
+        if not latest_dataset:
+            return {'data': None}
+        
         # Prepare summary response
         summary_data = {
-            'total_equipment': latest_dataset.total_equipment,
-            'average_values': {
-                'flowrate': round(latest_dataset.average_flowrate, 2),
-                'pressure': round(latest_dataset.average_pressure, 2),
-                'temperature': round(latest_dataset.average_temperature, 2)
-            },
-            'type_distribution': latest_dataset.type_distribution,
+            **_dataset_summary(latest_dataset),
             'upload_date': latest_dataset.upload_timestamp,
             'dataset_name': latest_dataset.name
         }
+        version = f'{latest_dataset.id}:{latest_dataset.upload_timestamp.isoformat()}'
         
-        return Response(summary_data, status=status.HTTP_200_OK)
+        return {
+            'data': summary_data,
+            'etag': f'"{hashlib.sha256(version.encode()).hexdigest()[:32]}"',
+            'last_modified': int(latest_dataset.upload_timestamp.timestamp())
+        }
 
 
 class HistoryView(APIView):
@@ -256,8 +382,15 @@ class HistoryView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, *args, **kwargs):
-        # Get last 5 datasets for the authenticated user
-        datasets = Dataset.objects.filter(user=request.user)[:5]
+        # Get the retained datasets for the authenticated user; with
+        # deferred eviction older ones may still be waiting to be swept
+        datasets = list(Dataset.objects.filter(user=request.user).defer(
+            'stats', 'type_statistics', 'quantile_sketches'
+        )[:Dataset.retention_limit(request.user)])
+        # The serializer reads user.username; reuse the authenticated user
+        # instead of loading it again for every dataset
+        for dataset in datasets:
+            dataset.user = request.user
         
         if not datasets:
             return Response(
@@ -273,10 +406,305 @@ class HistoryView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class AggregateView(APIView):
+    """
+    API endpoint to combine and compare the statistics of several datasets.
+    GET /api/aggregate/?ids=12,11,10
+    
+    The first dataset in 'ids' is the reference every dataset reports its
+    deltas against. Without 'ids' all of the user's datasets are compared,
+    newest first. Computed from the stored per-dataset statistics and
+    quantile sketches only; percentiles are approximate (see sketches.py).
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, *args, **kwargs):
+        datasets = Dataset.objects.filter(user=request.user)
+        ids_param = request.query_params.get('ids')
+        
+        if ids_param:
+            try:
+                ids = list(dict.fromkeys(
+                    int(value) for value in ids_param.split(',') if value.strip()
+                ))
+            except ValueError:
+                return Response(
+                    {'error': 'ids must be a comma-separated list of dataset ids'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            found = {dataset.id: dataset for dataset in datasets.filter(id__in=ids)}
+            missing = [str(dataset_id) for dataset_id in ids if dataset_id not in found]
+            if missing:
+                return Response(
+                    {'error': f'Datasets not found: {", ".join(missing)}'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            datasets = [found[dataset_id] for dataset_id in ids]
+        else:
+            datasets = list(datasets)
+        
+        if not datasets:
+            return Response(
+                {'error': 'No datasets found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        combined = empty_stats()
+        combined_sketches = SketchSet()
+        type_distribution = {}
+        entries = []
+        for dataset in datasets:
+            stats = dataset.ensure_stats()
+            if not stats:
+                return Response(
+                    {'error': f'Dataset {dataset.id} has no stored statistics, please upload it again'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            combined = merge_stats(combined, stats)
+            sketches = dataset.sketches()
+            combined_sketches.merge(sketches)
+            for eq_type, count in dataset.type_distribution.items():
+                type_distribution[eq_type] = type_distribution.get(eq_type, 0) + count
+            entries.append({
+                'id': dataset.id,
+                'name': dataset.name,
+                'upload_timestamp': dataset.upload_timestamp,
+                'total_equipment': dataset.total_equipment,
+                'type_distribution': dataset.type_distribution,
+                **describe_stats(stats, sketches),
+            })
+        
+        reference = entries[0]
+        for entry in entries:
+            entry['delta'] = _aggregate_delta(entry, reference)
+        
+        return Response({
+            'reference_id': reference['id'],
+            'combined': {
+                'dataset_count': len(entries),
+                'total_equipment': sum(entry['total_equipment'] for entry in entries),
+                'type_distribution': dict(sorted(type_distribution.items(), key=lambda item: -item[1])),
+                **describe_stats(combined, combined_sketches),
+            },
+            'datasets': entries,
+        }, status=status.HTTP_200_OK)
+
+
+def _difference(value, reference):
+    if value is None or reference is None:
+        return None
+    return value - reference
+
+
+def _aggregate_delta(entry, reference):
+    """
+    Differences of one aggregate entry from the reference entry.
+    """
+    eq_types = list(dict.fromkeys([*reference['type_distribution'], *entry['type_distribution']]))
+    return {
+        'total_equipment': entry['total_equipment'] - reference['total_equipment'],
+        'type_distribution': {
+            eq_type: entry['type_distribution'].get(eq_type, 0) - reference['type_distribution'].get(eq_type, 0)
+            for eq_type in eq_types
+        },
+        'columns': {
+            field: {
+                key: _difference(value, reference['columns'][field].get(key))
+                for key, value in column.items()
+                if key not in ('count', 'nulls')
+            }
+            for field, column in entry['columns'].items()
+        },
+    }
+
+
+class DatasetRowsView(APIView):
+    """
+    API endpoint to page through the stored equipment rows of a dataset.
+    GET /api/datasets/<dataset_id>/rows/?offset=0&limit=100
+    GET /api/datasets/<dataset_id>/rows/?cursor=<next_cursor>
+    GET /api/datasets/<dataset_id>/rows/?stream=1  (NDJSON, all rows)
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, dataset_id):
+        dataset = Dataset.objects.filter(id=dataset_id, user=request.user).first()
+        if not dataset:
+            return Response(
+                {'error': 'Dataset not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        rows = dataset.open_rows()
+        if rows is None:
+            return Response(
+                {'error': 'Rows are not available for this dataset'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if _flag(request, 'stream'):
+            response = StreamingHttpResponse(
+                _iter_ndjson(rows, settings.DATASET_ROWS_STREAM_BATCH),
+                content_type='application/x-ndjson'
+            )
+            response['Content-Disposition'] = f'attachment; filename="equipment_rows_{dataset.id}.ndjson"'
+            return response
+        
+        try:
+            if 'cursor' in request.query_params:
+                offset = _decode_cursor(request.query_params['cursor'])
+            else:
+                offset = int(request.query_params.get('offset', 0))
+            limit = int(request.query_params.get('limit', settings.DATASET_ROWS_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid offset, limit or cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if offset < 0 or limit < 1:
+            return Response(
+                {'error': 'Invalid offset, limit or cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = min(limit, settings.DATASET_ROWS_MAX_PAGE_SIZE)
+        
+        stop = min(offset + limit, len(rows))
+        next_cursor = _encode_cursor(stop) if stop < len(rows) else None
+        
+        return Response({
+            'dataset_id': dataset.id,
+            'count': len(rows),
+            'offset': offset,
+            'limit': limit,
+            'next_cursor': next_cursor,
+            'rows': rows.records(offset, stop) if offset < stop else []
+        }, status=status.HTTP_200_OK)
+
+
+class DatasetAnomaliesView(APIView):
+    """
+    API endpoint to page through the outliers flagged at ingest.
+    GET /api/datasets/<dataset_id>/anomalies/?offset=0&limit=100
+    GET /api/datasets/<dataset_id>/anomalies/?field=pressure
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, dataset_id):
+        dataset = Dataset.objects.filter(id=dataset_id, user=request.user).first()
+        if not dataset:
+            return Response(
+                {'error': 'Dataset not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        anomalies = dataset.open_anomalies()
+        if anomalies is None:
+            return Response(
+                {'error': 'Rows are not available for this dataset'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        field = request.query_params.get('field')
+        if field is not None and field not in ANOMALY_FIELDS:
+            return Response(
+                {'error': f'field must be one of: {", ".join(ANOMALY_FIELDS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            offset = int(request.query_params.get('offset', 0))
+            limit = int(request.query_params.get('limit', settings.DATASET_ROWS_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid offset or limit'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if offset < 0 or limit < 1:
+            return Response(
+                {'error': 'Invalid offset or limit'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = min(limit, settings.DATASET_ROWS_MAX_PAGE_SIZE)
+        
+        selected = anomalies.select(field)
+        page = selected[offset:offset + limit]
+        entries = anomalies.entries(page)
+        records = dataset.open_rows().records_at([entry['row'] for entry in entries])
+        for entry, record in zip(entries, records):
+            entry['data'] = record
+        
+        return Response({
+            'dataset_id': dataset.id,
+            'thresholds': anomalies.thresholds,
+            'counts': anomalies.counts(),
+            'count': len(selected),
+            'offset': offset,
+            'limit': limit,
+            'anomalies': entries
+        }, status=status.HTTP_200_OK)
+
+
+def _encode_cursor(offset):
+    return base64.urlsafe_b64encode(f'o:{offset}'.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        prefix, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    if prefix != 'o':
+        raise ValueError('Invalid cursor')
+    return int(offset)
+
+
+def _iter_ndjson(rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        records = rows.records(start, start + batch_size)
+        yield ''.join(json.dumps(record) + '\n' for record in records)
+
+
+class JobStatusView(APIView):
+    """
+    API endpoint to poll an asynchronous upload job.
+    GET /api/jobs/<job_id>/
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, job_id):
+        job = UploadJob.objects.filter(id=job_id, user=request.user).select_related('dataset').first()
+        if not job:
+            return Response(
+                {'error': 'Job not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        # Its worker may have died; requeue it rather than leave the
+        # client polling forever
+        if UploadJob.expired().filter(id=job.id).exists():
+            reap_stale_jobs()
+            job.refresh_from_db()
+        
+        response_data = {
+            'job_id': str(job.id),
+            'status': job.status,
+            'name': job.name,
+            'dataset_id': job.dataset_id,
+            'error': job.error or None,
+            'created_at': job.created_at,
+            'updated_at': job.updated_at
+        }
+        if job.dataset is not None:
+            response_data['summary'] = _dataset_summary(job.dataset)
+        
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
 class GeneratePDFReportView(APIView):
     """
     API endpoint to generate PDF report for a dataset.
     GET /api/generate-pdf/<dataset_id>/
+    GET /api/generate-pdf/<dataset_id>/?detailed=1  (appendix with every row)
+    Reports are cached per dataset and support If-None-Match; detailed
+    reports are built into a temporary file and streamed.
     """
     permission_classes = [IsAuthenticated]
     
@@ -295,115 +723,117 @@ class GeneratePDFReportView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            # Create HTTP response with PDF
-            response = HttpResponse(content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="equipment_report_{dataset.id}.pdf"'
-            
-            # Create PDF
-            doc = SimpleDocTemplate(response, pagesize=letter)
-            elements = []
-            styles = getSampleStyleSheet()
+            username = request.user.username
+            if _flag(request, 'detailed'):
+                return self.detailed_report(dataset, username)
             
-            # Custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                textColor=colors.HexColor('#667eea'),
-                spaceAfter=30,
-                alignment=TA_CENTER
-            )
-            
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=16,
-                textColor=colors.HexColor('#764ba2'),
-                spaceAfter=12,
-                spaceBefore=12
-            )
-            
-            # Title
-            title = Paragraph("Chemical Equipment Analysis Report", title_style)
-            elements.append(title)
-            elements.append(Spacer(1, 0.2*inch))
-            
-            # Report Info
-            info_data = [
-                ['Report Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
-                ['Dataset Name:', dataset.name],
-                ['Upload Date:', dataset.upload_timestamp.strftime('%Y-%m-%d %H:%M:%S')],
-                ['User:', request.user.username],
-            ]
-            
-            info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-            info_table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#667eea')),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ]))
-            elements.append(info_table)
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Summary Statistics
-            summary_heading = Paragraph("Summary Statistics", heading_style)
-            elements.append(summary_heading)
+            filename = f'equipment_report_{dataset.id}.pdf'
+            etag = report_etag(dataset, username)
             
-            summary_data = [
-                ['Metric', 'Value'],
-                ['Total Equipment', str(dataset.total_equipment)],
-                ['Average Flowrate', f"{dataset.average_flowrate:.2f}"],
-                ['Average Pressure', f"{dataset.average_pressure:.2f}"],
-                ['Average Temperature', f"{dataset.average_temperature:.2f}"],
-            ]
+            # Unchanged report already held by the client
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                not_modified['ETag'] = etag
+                return not_modified
             
-            summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
-            summary_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ]))
-            elements.append(summary_table)
-            elements.append(Spacer(1, 0.3*inch))
+            path = cached_report_path(dataset, username)
+            content = None
+            if path is not None:
+                record_cache('pdf_report', os.path.exists(path))
+            if path is None or not os.path.exists(path):
+                try:
+                    path, content = render_report_pooled(dataset, username)
+                except RenderBusy as e:
+                    response = Response(
+                        {'error': str(e)},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE
+                    )
+                    response['Retry-After'] = '10'
+                    return response
             
-            # Equipment Type Distribution
-            dist_heading = Paragraph("Equipment Type Distribution", heading_style)
-            elements.append(dist_heading)
-            
-            dist_data = [['Equipment Type', 'Count']]
-            for eq_type, count in dataset.type_distribution.items():
-                dist_data.append([eq_type, str(count)])
-            
-            dist_table = Table(dist_data, colWidths=[3*inch, 3*inch])
-            dist_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#764ba2')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ]))
-            elements.append(dist_table)
-            
-            # Build PDF
-            doc.build(elements)
+            if content is not None:
+                # Datasets without an on-disk store are not cached
+                response = HttpResponse(content, content_type='application/pdf')
+                response['Content-Disposition'] = f'attachment; filename="{filename}"'
+                return response
             
+            response = FileResponse(
+                open(path, 'rb'),
+                as_attachment=True,
+                filename=filename,
+                content_type='application/pdf'
+            )
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
             return response
             
         except Exception as e:
             return Response(
                 {'error': f'Error generating PDF: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+    
+    def detailed_report(self, dataset, username):
+        rows = dataset.open_rows()
+        if rows is None:
+            return Response(
+                {'error': 'Rows are not available for this dataset'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if len(rows) > settings.PDF_DETAILED_MAX_ROWS:
+            return Response(
+                {'error': f'Detailed reports are limited to {settings.PDF_DETAILED_MAX_ROWS} rows; '
+                          f'this dataset has {len(rows)}. Export the rows with '
+                          f'/api/datasets/{dataset.id}/rows/?stream=1 instead'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            path = render_detailed_report_pooled(dataset, username)
+        except RenderBusy as e:
+            response = Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response['Retry-After'] = '30'
+            return response
+        
+        # Unlink right away: the open handle keeps the file readable while
+        # it streams and the disk space is released when it is closed
+        handle = open(path, 'rb')
+        os.remove(path)
+        return FileResponse(
+            handle,
+            as_attachment=True,
+            filename=f'equipment_report_{dataset.id}_detailed.pdf',
+            content_type='application/pdf'
+        )
+
+
+class MetricsView(APIView):
+    """
+    Prometheus scrape endpoint.
+    GET /metrics
+    When METRICS_AUTH_TOKEN is set the scraper must send it as a bearer token.
+    Without a token metrics are only served with DEBUG on.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        token = settings.METRICS_AUTH_TOKEN
+        if not token and not settings.DEBUG:
+            return Response(
+                {'error': 'Metrics require METRICS_AUTH_TOKEN to be set'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if token and not hmac.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {token}'
+        ):
+            return Response(
+                {'error': 'Invalid metrics token'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        body, content_type = render_metrics()
+        return HttpResponse(body, content_type=content_type)
@@ -0,0 +1,117 @@
+"""
+Local process pools for work that should not run on a request worker.
+
+Pools use the spawn start method so workers never inherit the parent's
+database connections. Spawned workers import this module before Django is
+set up, so it must not import models at module level; tasks are submitted
+by dotted path and resolved inside the worker.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib import import_module
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def setup_worker():
+    import django
+    django.setup()
+
+
+def call(path, *args, **kwargs):
+    """
+    Import the function at dotted 'path' and call it.
+    """
+    module_name, func_name = path.rsplit('.', 1)
+    return getattr(import_module(module_name), func_name)(*args, **kwargs)
+
+
+class WorkerPool:
+    """
+    Lazily created ProcessPoolExecutor sized by a setting, shared by every
+    request served from this process.
+    """
+
+    def __init__(self, workers_setting):
+        self.workers_setting = workers_setting
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=getattr(settings, self.workers_setting),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=setup_worker,
+                )
+            return self._executor
+
+    def _reset(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, path, *args, **kwargs):
+        """
+        Run the function at dotted 'path' in the pool and return its Future.
+        A pool left broken by a dead worker is replaced once.
+        """
+        try:
+            return self._get_executor().submit(call, path, *args, **kwargs)
+        except BrokenProcessPool:
+            self._reset()
+            return self._get_executor().submit(call, path, *args, **kwargs)
+
+
+class HostSlots:
+    """
+    Counting semaphore shared by every process on the host: slot i is an
+    exclusive flock on '<directory>/slot-<i>.lock', so slots held by a
+    process that dies are freed with it. Without fcntl (Windows) the slots
+    fall back to a semaphore per process.
+    """
+
+    # Seconds between attempts while every slot is taken
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, directory, size):
+        self.directory = directory
+        self.size = size
+        self._local = None if fcntl else threading.BoundedSemaphore(size)
+
+    def acquire(self, timeout):
+        """
+        Take a free slot, waiting up to 'timeout' seconds. Returns a
+        callable that gives the slot back, or None when none came free.
+        """
+        if self._local is not None:
+            if not self._local.acquire(timeout=timeout):
+                return None
+            return self._local.release
+        os.makedirs(self.directory, exist_ok=True)
+        deadline = time.monotonic() + timeout
+        while True:
+            for index in range(self.size):
+                fd = os.open(os.path.join(self.directory, f'slot-{index}.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    continue
+                # Closing the descriptor drops the lock
+                return lambda: os.close(fd)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.POLL_INTERVAL)
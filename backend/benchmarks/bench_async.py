@@ -0,0 +1,170 @@
+"""
+Compare how many slow connections the WSGI and ASGI deployments absorb
+before other requests start waiting.
+
+    python benchmarks/bench_async.py --workers 2 --slow 0,2,4,8,16 --hold 3
+
+Each deployment is started with the same number of worker processes, like
+load_test.py does:
+
+    wsgi    gunicorn with sync workers (the render.yaml start command)
+    asgi    gunicorn with uvicorn workers and ASYNC_ENDPOINTS=True
+
+For every count in --slow, that many clients upload a CSV to /api/upload/
+while trickling its body over --hold seconds, as clients on slow links do.
+Meanwhile --probes fast GET /api/summary/ requests are made from
+--probe-clients threads, and their latency is reported. A sync worker is
+pinned for as long as an upload trickles in, so once the slow uploads
+outnumber the workers every probe waits for one to finish; under ASGI the
+body is buffered by the event loop and probes stay fast.
+
+The ASGI deployment really does process uploads concurrently, so on the
+default SQLite database some of them can fail with "database is locked"
+(counted in the last column); --database-url avoids that.
+"""
+
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+from load_test import Client, start_server, stop_server
+from synthetic_csv import csv_bytes
+
+
+DEPLOYMENTS = {
+    'wsgi': 'gunicorn',
+    'asgi': 'uvicorn',
+}
+
+
+def slow_upload(client, content, hold, pieces=20):
+    """
+    POST 'content' to /api/upload/ in 'pieces' parts spread over 'hold'
+    seconds. Returns the response status, or the exception name.
+    """
+    boundary = uuid.uuid4().hex
+    body = b''.join([
+        f'--{boundary}\r\n'.encode(),
+        b'Content-Disposition: form-data; name="file"; filename="slow.csv"\r\n',
+        b'Content-Type: text/csv\r\n\r\n',
+        content,
+        f'\r\n--{boundary}--\r\n'.encode(),
+    ])
+    connection = client.connection()
+    try:
+        connection.putrequest('POST', client.prefix + '/api/upload/?summary_only=1')
+        connection.putheader('Authorization', f'Bearer {client.token}')
+        connection.putheader('Content-Type', f'multipart/form-data; boundary={boundary}')
+        connection.putheader('Content-Length', str(len(body)))
+        connection.endheaders()
+        size = -(-len(body) // pieces)
+        for start in range(0, len(body), size):
+            connection.send(body[start:start + size])
+            time.sleep(hold / pieces)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except OSError as e:
+        return type(e).__name__
+    finally:
+        connection.close()
+
+
+def run_round(client, slow, args, seed):
+    """
+    Start 'slow' trickling uploads, probe the summary endpoint meanwhile and
+    return (probe latencies, probe failures, slow upload statuses).
+    """
+    contents = [csv_bytes(args.rows, seed=seed + index) for index in range(slow)]
+    statuses = []
+    threads = [
+        threading.Thread(target=lambda c=content: statuses.append(slow_upload(client, c, args.hold)))
+        for content in contents
+    ]
+    for thread in threads:
+        thread.start()
+    # Let the slow uploads occupy whatever they are going to occupy
+    time.sleep(min(0.5, args.hold / 4))
+
+    def probe(_):
+        started = time.perf_counter()
+        try:
+            status, _ = client.request('GET', '/api/summary/')
+        except OSError:
+            status = None
+        return time.perf_counter() - started, status
+
+    with ThreadPoolExecutor(args.probe_clients) as executor:
+        results = list(executor.map(probe, range(args.probes)))
+    for thread in threads:
+        thread.join()
+    latencies = [latency for latency, status in results if status == 200]
+    failures = sum(1 for _, status in results if status != 200)
+    return latencies, failures, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--deployments', default='wsgi,asgi', help='Comma-separated subset of: wsgi, asgi')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes per deployment')
+    parser.add_argument('--slow', default='0,2,4,8,16', help='Comma-separated numbers of slow uploads')
+    parser.add_argument('--hold', type=float, default=3.0, help='Seconds each slow upload takes to send')
+    parser.add_argument('--rows', type=int, default=2000, help='Rows per slowly uploaded CSV')
+    parser.add_argument('--probes', type=int, default=40, help='Summary requests per round')
+    parser.add_argument('--probe-clients', type=int, default=4, help='Concurrent summary requesters')
+    parser.add_argument('--database-url', help='Database for the servers (default: temporary SQLite)')
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request timeout in seconds')
+    parser.add_argument('--verbose', action='store_true', help="Show the servers' stderr")
+    args = parser.parse_args()
+
+    deployments = [name.strip() for name in args.deployments.split(',') if name.strip()]
+    unknown = set(deployments) - set(DEPLOYMENTS)
+    if unknown:
+        parser.error(f'unknown deployments: {", ".join(sorted(unknown))}')
+    counts = [int(count) for count in args.slow.split(',')]
+
+    rows = []
+    for deployment in deployments:
+        workdir = tempfile.mkdtemp(prefix='bench-async-')
+        server_args = SimpleNamespace(
+            server=DEPLOYMENTS[deployment], workers=args.workers, threads=1,
+            database_url=args.database_url, verbose=args.verbose,
+        )
+        process, base_url = start_server(server_args, workdir)
+        try:
+            client = Client(base_url, args.timeout)
+            client.log_in(0, uuid.uuid4().hex[:8])
+            # Something for the summary endpoint to report
+            status, _ = client.post_file('/api/upload/', 'seed.csv', csv_bytes(100, seed=10 ** 6))
+            if status != 201:
+                raise RuntimeError(f'Seeding upload failed with status {status}')
+            for round_index, slow in enumerate(counts):
+                latencies, failures, statuses = run_round(client, slow, args, seed=round_index * 1000)
+                latencies_ms = np.asarray(latencies) * 1000
+                rows.append([
+                    deployment, str(slow),
+                    *(f'{np.percentile(latencies_ms, p):.1f}' if len(latencies_ms) else '-' for p in (50, 95)),
+                    f'{latencies_ms.max():.1f}' if len(latencies_ms) else '-',
+                    str(failures),
+                    f'{sum(1 for status in statuses if status == 201)}/{slow}',
+                ])
+                print(f'{deployment}: {slow} slow uploads done', flush=True)
+        finally:
+            stop_server(process)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    header = ['deployment', 'slow uploads', 'probe p50 ms', 'probe p95 ms', 'probe max ms', 'probe failures', 'uploads ok']
+    widths = [max(len(row[column]) for row in [header] + rows) for column in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Compare DRF's stdlib JSONRenderer with api.renderers.ORJSONRenderer on an
+upload-style response carrying many equipment_data rows.
+
+Run from the backend directory:
+
+    python benchmarks/bench_json_renderers.py --rows 100000 --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chemical_analyzer.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import ORJSONRenderer
+
+
+TYPES = ['Pump', 'Compressor', 'Valve', 'HeatExchanger', 'Reactor', 'Condenser']
+
+
+def make_payload(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Equipment Name': [f'Equipment-{i}' for i in range(rows)],
+        'Type': rng.choice(TYPES, rows),
+        'Flowrate': rng.normal(120, 30, rows).round(2),
+        'Pressure': rng.normal(6, 1.5, rows).round(2),
+        'Temperature': rng.normal(110, 25, rows).round(2),
+    })
+    return {
+        'message': 'File uploaded successfully',
+        'dataset_id': 1,
+        'deduplicated': False,
+        'uploaded_at': timezone.now(),
+        'summary': {
+            'total_equipment': rows,
+            'average_values': {
+                'flowrate': round(df['Flowrate'].mean(), 2),
+                'pressure': round(df['Pressure'].mean(), 2),
+                'temperature': round(df['Temperature'].mean(), 2),
+            },
+            'type_distribution': df['Type'].value_counts().to_dict(),
+        },
+        'equipment_data': df.to_dict('records'),
+    }
+
+
+def bench(renderer, payload, repeat):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = renderer.render(payload, 'application/json', {})
+        timings.append(time.perf_counter() - start)
+        size = len(body)
+    return min(timings), sum(timings) / len(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    renderers = [('JSONRenderer', JSONRenderer()), ('ORJSONRenderer', ORJSONRenderer())]
+    print(f"{'rows':>8}  {'renderer':<16}{'best ms':>10}{'mean ms':>10}{'MB':>8}  speedup")
+    for rows in args.rows:
+        payload = make_payload(rows)
+        baseline = None
+        for name, renderer in renderers:
+            best, mean, size = bench(renderer, payload, args.repeat)
+            baseline = baseline or best
+            print(
+                f'{rows:>8}  {name:<16}{best * 1000:>10.1f}{mean * 1000:>10.1f}'
+                f'{size / 1e6:>8.2f}  x{baseline / best:.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Time the email lookups of the login and registration endpoints against a
+throwaway SQLite database holding many users.
+
+    python benchmarks/bench_login.py --users 100000
+
+Compares the previous lookups (three email__iexact queries per login, one
+exists() query per candidate username) with the current ones (one
+LOWER(email) query using api_user_email_lower_idx, one username prefix
+query whose rows are matched against 'base<digits>' in Python), and prints
+the query plans of the queries the views run. Password hashing is left out:
+it costs the same in both versions and would hide the query time.
+
+SQLite's LIKE is case-insensitive, so the username prefix query scans here;
+on PostgreSQL it uses the varchar_pattern_ops index Django creates for
+auth_user.username.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_workdir = tempfile.mkdtemp(prefix='bench-login-')
+os.environ.update({
+    'DJANGO_SETTINGS_MODULE': 'chemical_analyzer.settings',
+    'DATABASE_URL': f'sqlite:///{os.path.join(_workdir, "db.sqlite3")}',
+    'CACHE_DIR': os.path.join(_workdir, 'cache'),
+})
+
+import django
+
+django.setup()
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+from api.views import _free_username, _usernames_starting_with, _users_by_email
+
+
+def legacy_login_lookup(email):
+    matched = User.objects.filter(email__iexact=email)
+    if not matched.exists():
+        return None
+    if matched.count() > 1:
+        return None
+    return matched.first()
+
+
+def login_lookup(email):
+    matched = list(_users_by_email(email)[:2])
+    return matched[0] if len(matched) == 1 else None
+
+
+def legacy_free_username(base):
+    username = base
+    suffix = 1
+    while User.objects.filter(username=username).exists():
+        suffix += 1
+        username = f"{base}{suffix}"
+    return username
+
+
+def populate(count, collisions):
+    password = make_password('bench-password')
+    batch = []
+    for i in range(count):
+        batch.append(User(username=f'user{i}', email=f'User{i}@Example.com', password=password))
+        if len(batch) == 10000:
+            User.objects.bulk_create(batch)
+            batch = []
+    # 'engineer', 'engineer2', ... all taken, as after many sign-ups from
+    # engineer@<company> addresses
+    batch += [User(username='engineer', email='engineer@plant0.com', password=password)]
+    batch += [
+        User(username=f'engineer{i}', email=f'engineer@plant{i}.com', password=password)
+        for i in range(2, collisions + 1)
+    ]
+    User.objects.bulk_create(batch)
+
+
+def timed(func, arg, repeat):
+    with CaptureQueriesContext(connection) as queries:
+        func(arg)
+    count = len(queries.captured_queries)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+        reset_queries()
+    return best, count
+
+
+def plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return '; '.join(row[-1] for row in cursor.fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--collisions', type=int, default=200, help='taken engineerN usernames')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    start = time.perf_counter()
+    populate(args.users, args.collisions)
+    print(f'{User.objects.count()} users created in {time.perf_counter() - start:.1f}s\n')
+
+    email = f'user{args.users // 2}@example.COM'
+    rows = [
+        ('login lookup (before)', legacy_login_lookup, email),
+        ('login lookup (after)', login_lookup, email),
+        ('free username (before)', legacy_free_username, 'engineer'),
+        ('free username (after)', _free_username, 'engineer'),
+    ]
+    print(f"{'':<24}{'best ms':>10}{'queries':>9}")
+    for name, func, arg in rows:
+        best, queries = timed(func, arg, args.repeat)
+        print(f'{name:<24}{best * 1000:>10.2f}{queries:>9}')
+
+    print('\nquery plans')
+    print('  email__iexact: ', plan(User.objects.filter(email__iexact=email)))
+    print('  LOWER(email):  ', plan(_users_by_email(email)))
+    print('  prefix:        ', plan(_usernames_starting_with('engineer')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Measure cold-start costs: management commands, worker boot and the first
+requests a fresh server answers.
+
+    python benchmarks/bench_startup.py --repeat 3 --workers 2
+
+Three measurements, each repeated --repeat times (medians are reported):
+
+    check      wall time of 'python manage.py check'
+    import     wall time of django.setup() plus loading the URLconf, the
+               work every worker does before its first request, and whether
+               pandas and reportlab were imported by it
+    server     gunicorn (the render.yaml start command) with and without
+               preload_app (GUNICORN_PRELOAD, see gunicorn.conf.py):
+               time from launch until the first response, latency of the
+               first requests (register and log in, an upload, a second
+               upload, a summary and a PDF report) and the memory of the
+               server's process tree once they are done
+
+Memory is reported both as the sum of RSS, which counts pages shared
+between the master and its forked workers once per process, and as the sum
+of PSS from /proc/<pid>/smaps_rollup, which splits shared pages between the
+processes sharing them and so shows what preloading saves. With several
+workers the first requests may land on different workers.
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from types import SimpleNamespace
+
+from load_test import BACKEND_DIR, Client, _process_tree, _rss_bytes, server_env, start_server, stop_server
+from synthetic_csv import csv_bytes
+
+
+HEAVY_MODULES = ['numpy', 'pandas', 'reportlab']
+
+IMPORT_PROBE = f'''
+import json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chemical_analyzer.settings')
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({{
+    'seconds': time.perf_counter() - started,
+    'modules': [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+'''
+
+# Requests timed on a freshly started server, in order
+FIRST_REQUESTS = ['log in', 'upload', 'second upload', 'summary', 'pdf']
+
+
+def _pss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as handle:
+            for line in handle:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def time_check():
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, 'manage.py', 'check', '-v', '0'],
+        cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - started
+
+
+def time_import():
+    """
+    Returns (seconds, heavy modules imported) for setting up Django and
+    loading the URLconf in a fresh interpreter.
+    """
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_PROBE],
+        cwd=BACKEND_DIR, check=True, capture_output=True, text=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result['seconds'], result['modules']
+
+
+def _timed(call):
+    started = time.perf_counter()
+    status, _ = call()
+    return time.perf_counter() - started, status
+
+
+def time_server(args, preload, seed):
+    """
+    Start gunicorn and time its first requests. Returns a dict of seconds
+    per measurement plus the memory of the process tree in bytes.
+    """
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    server_args = SimpleNamespace(
+        server='gunicorn', workers=args.workers, threads=1,
+        database_url=None, verbose=args.verbose,
+    )
+    env = dict(server_env(server_args, workdir), GUNICORN_PRELOAD=str(preload))
+    try:
+        launched = time.perf_counter()
+        process, base_url = start_server(server_args, workdir, env)
+        try:
+            client = Client(base_url, args.timeout)
+            # Any answer will do: unauthenticated requests are refused
+            while True:
+                try:
+                    client.request('GET', '/api/summary/')
+                    break
+                except OSError:
+                    time.sleep(0.05)
+            result = {'ready': time.perf_counter() - launched}
+
+            started = time.perf_counter()
+            client.log_in(0, uuid.uuid4().hex[:8])
+            result['log in'] = time.perf_counter() - started
+            for name, index in [('upload', 0), ('second upload', 1)]:
+                content = csv_bytes(args.rows, seed=seed + index)
+                result[name], status = _timed(
+                    lambda: client.post_file('/api/upload/?summary_only=1', f'{name}.csv', content)
+                )
+                if status != 201:
+                    raise RuntimeError(f'{name} failed with status {status}')
+            result['summary'], _ = _timed(lambda: client.request('GET', '/api/summary/'))
+            result['pdf'], _ = _timed(lambda: client.request('GET', '/api/generate-pdf/'))
+
+            pids = _process_tree(process.pid)
+            result['rss'] = sum(_rss_bytes(pid) for pid in pids)
+            result['pss'] = sum(_pss_bytes(pid) for pid in pids)
+            return result
+        finally:
+            stop_server(process)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_table(header, rows):
+    widths = [max(len(row[column]) for row in [header] + rows) for column in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of every measurement')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--rows', type=int, default=2000, help='Rows per uploaded CSV')
+    parser.add_argument('--skip-server', action='store_true', help='Only time check and import')
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request timeout in seconds')
+    parser.add_argument('--verbose', action='store_true', help="Show the servers' stderr")
+    args = parser.parse_args()
+
+    checks = [time_check() for _ in range(args.repeat)]
+    imports = [time_import() for _ in range(args.repeat)]
+    print_table(['command', 'median ms', 'min ms', 'heavy modules imported'], [
+        ['manage.py check', f'{statistics.median(checks) * 1000:.0f}', f'{min(checks) * 1000:.0f}', '-'],
+        [
+            'setup + URLconf',
+            f'{statistics.median(seconds for seconds, _ in imports) * 1000:.0f}',
+            f'{min(seconds for seconds, _ in imports) * 1000:.0f}',
+            ', '.join(imports[-1][1]) or 'none',
+        ],
+    ])
+    if args.skip_server:
+        return
+
+    print()
+    rows = []
+    for preload in (False, True):
+        runs = [time_server(args, preload, seed=run * 10) for run in range(args.repeat)]
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        rows.append(
+            ['on' if preload else 'off', f'{median["ready"] * 1000:.0f}']
+            + [f'{median[name] * 1000:.0f}' for name in FIRST_REQUESTS]
+            + [f'{median["rss"] / 2 ** 20:.0f}', f'{median["pss"] / 2 ** 20:.0f}']
+        )
+        print(f'preload {"on" if preload else "off"}: {args.repeat} runs done', flush=True)
+    print_table(
+        ['preload', 'ready ms'] + [f'{name} ms' for name in FIRST_REQUESTS] + ['RSS MB', 'PSS MB'],
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
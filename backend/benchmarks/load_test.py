@@ -0,0 +1,450 @@
+"""
+Load-test the upload, summary, history and PDF endpoints with concurrent
+clients and report throughput, latency percentiles and peak server RSS.
+
+    python benchmarks/load_test.py --clients 8 --rows 20000 --types 12
+
+By default a gunicorn server is started on a free local port against a
+throwaway SQLite database, cache and dataset store (migrated first), and
+stopped at the end; --server uvicorn runs the ASGI application on uvicorn
+workers with the async endpoints (ASYNC_ENDPOINTS), --server runserver
+uses Django's development server, and --url points the test at a server
+that is already running
+(pass --pid to still sample its memory). --database-url runs the started
+server against another database, e.g. PostgreSQL: concurrent uploads on
+SQLite serialize on its write lock and may fail with "database is locked".
+
+Each client registers its own user and then runs the phases in turn:
+
+    upload     POST /api/upload/ with a distinct synthetic CSV (--uploads each)
+    summary    GET /api/summary/ (--requests each)
+    history    GET /api/history/ (--requests each)
+    pdf        GET /api/generate-pdf/ (--requests each; the first renders,
+               the rest are served from the report cache)
+
+Peak RSS is the largest combined resident size of the server process and
+its children (gunicorn workers, PDF render processes) sampled during each
+phase, read from /proc. Where /proc is not available only the overall peak
+of the largest child process is reported, via resource.getrusage once the
+server has exited. --json writes the results for comparing runs.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from synthetic_csv import csv_bytes
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ['upload', 'summary', 'history', 'pdf']
+PERCENTILES = [50, 90, 95, 99]
+PASSWORD = 'bench-password-123'
+
+
+class Client:
+    """
+    Minimal HTTP client for one simulated user. Opens a new connection per
+    request so results do not depend on the server's keep-alive support.
+    """
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.token = None
+
+    def connection(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Returns (status, response body). The body is read in full.
+        """
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        connection = self.connection()
+        try:
+            connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    def post_json(self, path, data):
+        return self.request('POST', path, json.dumps(data), {'Content-Type': 'application/json'})
+
+    def post_file(self, path, name, content):
+        boundary = uuid.uuid4().hex
+        body = b''.join([
+            f'--{boundary}\r\n'.encode(),
+            f'Content-Disposition: form-data; name="file"; filename="{name}"\r\n'.encode(),
+            b'Content-Type: text/csv\r\n\r\n',
+            content,
+            f'\r\n--{boundary}--\r\n'.encode(),
+        ])
+        return self.request('POST', path, body, {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+    def log_in(self, index, run_id):
+        username = f'bench-{run_id}-{index}'
+        email = f'{username}@example.com'
+        status, body = self.post_json('/api/register/', {
+            'username': username, 'email': email, 'password': PASSWORD,
+        })
+        if status not in (200, 201):
+            raise RuntimeError(f'Registering {username} failed ({status}): {body[:200]!r}')
+        status, body = self.post_json('/api/login/', {'email': email, 'password': PASSWORD})
+        if status != 200:
+            raise RuntimeError(f'Logging in {username} failed ({status}): {body[:200]!r}')
+        self.token = json.loads(body)['access']
+
+
+def _process_tree(root):
+    """
+    PIDs of 'root' and all its descendants, from /proc/<pid>/stat.
+    """
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as handle:
+                stat = handle.read()
+        except OSError:
+            continue
+        # The command name may contain spaces; fields resume after ')'
+        parent = int(stat.rsplit(')', 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry))
+    tree, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, []))
+    return tree
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/status') as handle:
+            for line in handle:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class RSSSampler:
+    """
+    Samples the combined RSS of a process tree in a background thread and
+    keeps the peak since the last reset.
+    """
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.available = pid is not None and os.path.exists(f'/proc/{pid}/status')
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        if self.available:
+            total = sum(_rss_bytes(pid) for pid in _process_tree(self.pid))
+            self.peak = max(self.peak, total)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        if self.available:
+            self._thread.start()
+
+    def reset(self):
+        self.peak = 0
+        self.sample()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_env(args, workdir):
+    """
+    Migrate a throwaway database in 'workdir' and return the environment to
+    start the server with.
+    """
+    env = dict(
+        os.environ,
+        DEBUG='False',
+        ALLOWED_HOSTS='127.0.0.1,localhost',
+        DATABASE_URL=args.database_url or f'sqlite:///{os.path.join(workdir, "db.sqlite3")}',
+        CACHE_DIR=os.path.join(workdir, 'cache'),
+        DATASET_STORE_ROOT=os.path.join(workdir, 'datasets'),
+        UPLOAD_JOB_SPOOL_ROOT=os.path.join(workdir, 'upload_jobs'),
+    )
+    subprocess.run(
+        [sys.executable, 'manage.py', 'migrate', '--noinput', '-v', '0'],
+        cwd=BACKEND_DIR, env=env, check=True,
+    )
+    return env
+
+
+def start_server(args, workdir, env=None):
+    """
+    Start the server on a free port, with 'env' from server_env (a fresh
+    one by default). Returns (process, base URL).
+    """
+    port = _free_port()
+    if env is None:
+        env = server_env(args, workdir)
+    if args.server == 'gunicorn':
+        command = [
+            sys.executable, '-m', 'gunicorn', 'chemical_analyzer.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+            '--threads', str(args.threads), '--timeout', '300', '--log-level', 'warning',
+        ]
+    elif args.server == 'uvicorn':
+        env = dict(env, ASYNC_ENDPOINTS='True')
+        command = [
+            sys.executable, '-m', 'gunicorn', 'chemical_analyzer.asgi:application',
+            '--worker-class', 'uvicorn.workers.UvicornWorker',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+            '--timeout', '300', '--log-level', 'warning',
+        ]
+    else:
+        command = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+    process = subprocess.Popen(
+        command, cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with status {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('Server did not start within 60 seconds')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_phase(clients, calls):
+    """
+    Run 'calls' (a list of (client index, callable) pairs) with one thread
+    per client. Each callable makes one request and returns its status.
+    Returns (latencies in seconds, statuses, wall time).
+    """
+    per_client = {}
+    for index, call in calls:
+        per_client.setdefault(index, []).append(call)
+
+    def run_client(index):
+        results = []
+        for call in per_client.get(index, []):
+            started = time.perf_counter()
+            try:
+                status = call()
+            except OSError as e:
+                status = type(e).__name__
+            results.append((time.perf_counter() - started, status))
+        return results
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        results = [item for chunk in executor.map(run_client, range(len(clients))) for item in chunk]
+    wall = time.perf_counter() - started
+    return [latency for latency, _ in results], [status for _, status in results], wall
+
+
+def phase_calls(phase, clients, args, uploads):
+    calls = []
+    for index, client in enumerate(clients):
+        if phase == 'upload':
+            query = '?summary_only=1' if args.summary_only else ''
+            for name, content in uploads[index]:
+                calls.append((index, lambda c=client, n=name, b=content: c.post_file(f'/api/upload/{query}', n, b)[0]))
+            continue
+        path = {
+            'summary': '/api/summary/',
+            'history': '/api/history/',
+            'pdf': '/api/generate-pdf/',
+        }[phase]
+        for _ in range(args.requests):
+            calls.append((index, lambda c=client, p=path: c.request('GET', p)[0]))
+    return calls
+
+
+def summarize(phase, latencies, statuses, wall, peak_rss):
+    errors = {}
+    for status in statuses:
+        if not isinstance(status, int) or status >= 400:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    latencies_ms = np.asarray(latencies) * 1000
+    result = {
+        'phase': phase,
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': wall,
+        'throughput': len(latencies) / wall if wall else None,
+        'peak_rss_bytes': peak_rss,
+    }
+    for percentile in PERCENTILES:
+        result[f'p{percentile}_ms'] = float(np.percentile(latencies_ms, percentile)) if len(latencies_ms) else None
+    result['max_ms'] = float(latencies_ms.max()) if len(latencies_ms) else None
+    return result
+
+
+def _format(value, digits=1):
+    return '-' if value is None else f'{value:.{digits}f}'
+
+
+def print_table(results):
+    header = ['phase', 'requests', 'errors', 'req/s'] + [f'p{p} ms' for p in PERCENTILES] + ['max ms', 'peak RSS MB']
+    rows = []
+    for result in results:
+        rows.append([
+            result['phase'],
+            str(result['requests']),
+            str(sum(result['errors'].values())),
+            _format(result['throughput']),
+        ] + [_format(result[f'p{p}_ms']) for p in PERCENTILES] + [
+            _format(result['max_ms']),
+            _format(result['peak_rss_bytes'] / 2 ** 20 if result['peak_rss_bytes'] else None),
+        ])
+    widths = [max(len(row[column]) for row in [header] + rows) for column in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+    for result in results:
+        if result['errors']:
+            print(f"{result['phase']}: errors by status {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Test a server that is already running at this URL')
+    parser.add_argument('--pid', type=int, help='PID of the --url server, to sample its memory')
+    parser.add_argument('--server', choices=['gunicorn', 'uvicorn', 'runserver'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per (WSGI) worker')
+    parser.add_argument('--database-url', help='Database for the started server (default: temporary SQLite)')
+    parser.add_argument('--clients', type=int, default=4, help='Concurrent clients, one user each')
+    parser.add_argument('--uploads', type=int, default=2, help='CSV uploads per client')
+    parser.add_argument('--requests', type=int, default=20, help='GET requests per client and phase')
+    parser.add_argument('--rows', type=int, default=5000, help='Rows per uploaded CSV')
+    parser.add_argument('--types', type=int, default=6, help='Equipment types per uploaded CSV')
+    parser.add_argument('--missing', type=float, default=0.0, help='Fraction of empty numeric values')
+    parser.add_argument('--outliers', type=float, default=0.01, help='Fraction of out-of-range numeric values')
+    parser.add_argument('--summary-only', action='store_true', help='Upload with ?summary_only=1')
+    parser.add_argument('--phases', default=','.join(PHASES), help='Comma-separated subset of: ' + ', '.join(PHASES))
+    parser.add_argument('--timeout', type=float, default=300, help='Per-request timeout in seconds')
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help="Show the server's stderr")
+    args = parser.parse_args()
+
+    phases = [phase.strip() for phase in args.phases.split(',') if phase.strip()]
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        parser.error(f'unknown phases: {", ".join(sorted(unknown))}')
+
+    # Distinct bytes per upload so none is answered from the dedup path
+    uploads = [
+        [
+            (f'bench-{index}-{number}.csv', csv_bytes(
+                args.rows, args.types, seed=index * args.uploads + number,
+                missing=args.missing, outliers=args.outliers,
+            ))
+            for number in range(args.uploads)
+        ]
+        for index in range(args.clients)
+    ]
+    print(f'{args.clients} clients, {args.uploads} uploads of {args.rows} rows '
+          f'({len(uploads[0][0][1]) / 2 ** 20:.1f} MB) and {args.requests} requests per phase each'
+          if args.uploads else f'{args.clients} clients, {args.requests} requests per phase each')
+
+    workdir = tempfile.mkdtemp(prefix='bench-load-')
+    process = None
+    try:
+        if args.url:
+            base_url, pid = args.url, args.pid
+        else:
+            process, base_url = start_server(args, workdir)
+            pid = process.pid
+        print(f'Server: {base_url}')
+
+        run_id = uuid.uuid4().hex[:8]
+        clients = [Client(base_url, args.timeout) for _ in range(args.clients)]
+        for index, client in enumerate(clients):
+            client.log_in(index, run_id)
+
+        sampler = RSSSampler(pid)
+        sampler.start()
+        results = []
+        for phase in phases:
+            sampler.reset()
+            latencies, statuses, wall = run_phase(clients, phase_calls(phase, clients, args, uploads))
+            # Short phases may finish between two background samples
+            sampler.sample()
+            results.append(summarize(phase, latencies, statuses, wall, sampler.peak if sampler.available else None))
+        sampler.stop()
+    finally:
+        if process is not None:
+            stop_server(process)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(results)
+    overall_peak = None
+    if process is not None and not sampler.available:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        overall_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        overall_peak *= 1 if sys.platform == 'darwin' else 1024
+        print(f'Peak RSS of the largest server process: {overall_peak / 2 ** 20:.1f} MB')
+
+    if args.json:
+        with open(args.json, 'w') as handle:
+            json.dump({
+                'parameters': {key: value for key, value in vars(args).items() if key != 'json'},
+                'results': results,
+                'peak_rss_bytes': overall_peak,
+            }, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
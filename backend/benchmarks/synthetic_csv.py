@@ -0,0 +1,106 @@
+"""
+Generate synthetic equipment CSVs for benchmarking.
+
+    python benchmarks/synthetic_csv.py out.csv --rows 100000 --types 12
+
+Every row gets a Type drawn from 'types' equipment types (the first few are
+the familiar Pump, Valve, ...; the rest are numbered), with Flowrate,
+Pressure and Temperature drawn from a normal distribution centred on values
+specific to that Type. A fraction of the values can be left empty
+(--missing) or pushed far out of range (--outliers) to exercise the
+validation and anomaly paths. The same seed always gives the same bytes.
+"""
+
+import argparse
+import io
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+BASE_TYPES = ['Pump', 'Valve', 'Compressor', 'HeatExchanger', 'Reactor', 'Condenser']
+COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+# Rows generated and written per batch
+BATCH_ROWS = 100000
+
+
+def type_names(types):
+    """
+    'types' distinct equipment type names.
+    """
+    names = BASE_TYPES[:types]
+    names += [f'Type-{index:03d}' for index in range(len(names) + 1, types + 1)]
+    return names
+
+
+def _batch(rng, start, rows, names, centres, missing, outliers):
+    codes = rng.integers(len(names), size=rows)
+    frame = pd.DataFrame({
+        'Equipment Name': [f'EQ-{number:07d}' for number in range(start + 1, start + rows + 1)],
+        'Type': np.asarray(names, dtype=object)[codes],
+    })
+    for index, column in enumerate(COLUMNS[2:]):
+        mean = centres[codes, index]
+        values = rng.normal(mean, mean * 0.1)
+        if outliers:
+            extreme = rng.random(rows) < outliers
+            values[extreme] = mean[extreme] * rng.uniform(3, 10, size=int(extreme.sum()))
+        if missing:
+            values[rng.random(rows) < missing] = np.nan
+        frame[column] = values.round(2)
+    return frame
+
+
+def write_csv(handle, rows, types=6, seed=0, missing=0.0, outliers=0.0):
+    """
+    Write a synthetic CSV with 'rows' rows and 'types' equipment types to
+    the text handle 'handle'.
+    """
+    rng = np.random.default_rng(seed)
+    names = type_names(types)
+    # Per-Type centres for Flowrate, Pressure and Temperature
+    centres = np.column_stack([
+        rng.uniform(50, 300, size=types),
+        rng.uniform(2, 20, size=types),
+        rng.uniform(60, 250, size=types),
+    ])
+    for start in range(0, rows, BATCH_ROWS):
+        count = min(BATCH_ROWS, rows - start)
+        frame = _batch(rng, start, count, names, centres, missing, outliers)
+        frame.to_csv(handle, index=False, header=start == 0)
+    if not rows:
+        handle.write(','.join(COLUMNS) + '\n')
+
+
+def csv_bytes(rows, types=6, seed=0, missing=0.0, outliers=0.0):
+    """
+    Synthetic CSV (see write_csv) as bytes.
+    """
+    handle = io.StringIO()
+    write_csv(handle, rows, types, seed, missing, outliers)
+    return handle.getvalue().encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output', help="Path of the CSV to write, '-' for stdout")
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--types', type=int, default=6, help='Number of distinct equipment types')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--missing', type=float, default=0.0, help='Fraction of empty numeric values')
+    parser.add_argument('--outliers', type=float, default=0.0, help='Fraction of out-of-range numeric values')
+    args = parser.parse_args()
+
+    if args.types < 1:
+        parser.error('--types must be at least 1')
+
+    if args.output == '-':
+        write_csv(sys.stdout, args.rows, args.types, args.seed, args.missing, args.outliers)
+        return
+    with open(args.output, 'w', newline='') as handle:
+        write_csv(handle, args.rows, args.types, args.seed, args.missing, args.outliers)
+
+
+if __name__ == '__main__':
+    main()
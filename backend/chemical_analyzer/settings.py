@@ -3,7 +3,9 @@ Django settings for chemical_analyzer project.
 """
 
 from pathlib import Path
+import json
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -116,8 +118,10 @@ CORS_ALLOW_CREDENTIALS = True
 
 # REST Framework settings
 REST_FRAMEWORK = {
+    # Set JSON_RENDERER=rest_framework.renderers.JSONRenderer to use the
+    # stdlib encoder instead of orjson
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        os.environ.get('JSON_RENDERER', 'api.renderers.ORJSONRenderer'),
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -125,7 +129,7 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.FormParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -148,4 +152,124 @@ SIMPLE_JWT = {
 
 # Media files
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# CSV ingestion
+# Uploads larger than the threshold are summarised in chunks of
+# CSV_INGEST_CHUNK_ROWS rows instead of being parsed into one DataFrame.
+CSV_INGEST_CHUNK_ROWS = int(os.environ.get('CSV_INGEST_CHUNK_ROWS', '50000'))
+CSV_STREAMING_THRESHOLD_BYTES = int(os.environ.get('CSV_STREAMING_THRESHOLD_BYTES', str(50 * 1024 * 1024)))
+# pandas parser for whole-file reads: 'c', 'pyarrow', or 'auto' (pyarrow if
+# installed). Chunked reads always use the C parser.
+CSV_PARSER_ENGINE = os.environ.get('CSV_PARSER_ENGINE', 'auto')
+
+# Columnar row storage for uploaded datasets
+DATASET_STORE_ROOT = os.environ.get('DATASET_STORE_ROOT', os.path.join(MEDIA_ROOT, 'datasets'))
+
+# Paging for /api/datasets/<id>/rows/
+DATASET_ROWS_PAGE_SIZE = 100
+DATASET_ROWS_MAX_PAGE_SIZE = 5000
+DATASET_ROWS_STREAM_BATCH = 10000
+
+# Uploads are hashed while Django streams them so identical re-uploads can be
+# answered from the existing dataset
+FILE_UPLOAD_HANDLERS = [
+    'api.uploads.HashingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Asynchronous uploads (?async=1)
+UPLOAD_JOB_WORKERS = int(os.environ.get('UPLOAD_JOB_WORKERS', '2'))
+UPLOAD_JOB_QUEUE_LIMIT = int(os.environ.get('UPLOAD_JOB_QUEUE_LIMIT', '20'))
+UPLOAD_JOB_SPOOL_ROOT = os.environ.get('UPLOAD_JOB_SPOOL_ROOT', os.path.join(MEDIA_ROOT, 'upload_jobs'))
+# A running job refreshes its lease every third of UPLOAD_JOB_LEASE_SECONDS;
+# jobs whose lease ran out (worker killed) or that stayed queued longer than
+# UPLOAD_JOB_QUEUED_TIMEOUT are requeued, up to UPLOAD_JOB_MAX_ATTEMPTS claims
+UPLOAD_JOB_LEASE_SECONDS = int(os.environ.get('UPLOAD_JOB_LEASE_SECONDS', '120'))
+UPLOAD_JOB_QUEUED_TIMEOUT = int(os.environ.get('UPLOAD_JOB_QUEUED_TIMEOUT', '600'))
+UPLOAD_JOB_MAX_ATTEMPTS = int(os.environ.get('UPLOAD_JOB_MAX_ATTEMPTS', '3'))
+
+# Render each dataset's PDF report right after upload so the first
+# download is served from the cache
+PDF_PRERENDER_ON_UPLOAD = os.environ.get('PDF_PRERENDER_ON_UPLOAD', 'False').lower() == 'true'
+
+# PDF render pool: each web process runs at most PDF_RENDER_WORKERS renders
+# at once (0 renders inline). At most PDF_RENDER_QUEUE_LIMIT renders, across
+# all web processes on the host, run or wait for a worker; the slots are
+# lock files in PDF_RENDER_SLOTS_DIR
+PDF_RENDER_WORKERS = int(os.environ.get('PDF_RENDER_WORKERS', '2'))
+PDF_RENDER_QUEUE_LIMIT = int(os.environ.get('PDF_RENDER_QUEUE_LIMIT', '8'))
+PDF_RENDER_SLOTS_DIR = os.environ.get(
+    'PDF_RENDER_SLOTS_DIR', os.path.join(tempfile.gettempdir(), 'chemical-analyzer-render-slots')
+)
+PDF_RENDER_QUEUE_TIMEOUT = float(os.environ.get('PDF_RENDER_QUEUE_TIMEOUT', '5'))
+PDF_RENDER_TIMEOUT = float(os.environ.get('PDF_RENDER_TIMEOUT', '60'))
+PDF_DETAILED_RENDER_TIMEOUT = float(os.environ.get('PDF_DETAILED_RENDER_TIMEOUT', '600'))
+
+# reportlab keeps every page of a report in memory until it is saved, so
+# detailed reports are refused for datasets with more rows than this (about
+# 25 MB of render memory per 100k rows); their rows can be exported as NDJSON
+PDF_DETAILED_MAX_ROWS = int(os.environ.get('PDF_DETAILED_MAX_ROWS', '100000'))
+
+# Cache shared by all workers on the host (set REDIS_URL to share it across
+# hosts)
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, '.cache')),
+        }
+    }
+
+# Seconds a user's /api/summary/ payload stays cached between uploads
+SUMMARY_CACHE_TIMEOUT = int(os.environ.get('SUMMARY_CACHE_TIMEOUT', '300'))
+
+# Outlier detection at ingest: a value is flagged when its z-score within its
+# equipment Type exceeds the threshold, or when it lies more than
+# ANOMALY_IQR_FACTOR interquartile ranges outside the Type's quartiles
+ANOMALY_ZSCORE_THRESHOLD = float(os.environ.get('ANOMALY_ZSCORE_THRESHOLD', '3.0'))
+ANOMALY_IQR_FACTOR = float(os.environ.get('ANOMALY_IQR_FACTOR', '1.5'))
+
+# Dataset retention: each user keeps their DATASET_RETENTION_LIMIT newest
+# datasets; DATASET_RETENTION_LIMITS overrides it per username, e.g.
+# '{"alice": 20}'. With DATASET_RETENTION_EVICTION=deferred uploads skip
+# eviction and the enforce_retention command does it instead.
+DATASET_RETENTION_LIMIT = int(os.environ.get('DATASET_RETENTION_LIMIT', '5'))
+DATASET_RETENTION_LIMITS = json.loads(os.environ.get('DATASET_RETENTION_LIMITS', '{}'))
+DATASET_RETENTION_EVICTION = os.environ.get('DATASET_RETENTION_EVICTION', 'inline')
+
+# Seconds an authenticated user stays cached for JWT requests; entries are
+# dropped whenever the user is saved or deleted
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', '60'))
+
+# Opt-in per-request profiling (see api/profiling.py): a Server-Timing header
+# with phase timings, SQL query count and time and peak memory, and a warning
+# for requests slower than PROFILING_SLOW_REQUEST_MS
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', 'False').lower() == 'true'
+PROFILING_SLOW_REQUEST_MS = float(os.environ.get('PROFILING_SLOW_REQUEST_MS', '1000'))
+PROFILING_TRACE_MEMORY = os.environ.get('PROFILING_TRACE_MEMORY', 'True').lower() == 'true'
+if REQUEST_PROFILING:
+    MIDDLEWARE.insert(0, 'api.profiling.ProfilingMiddleware')
+
+# Prometheus metrics at /metrics (see api/metrics.py). Under gunicorn the
+# workers share samples through PROMETHEUS_MULTIPROC_DIR, which
+# gunicorn.conf.py sets up. METRICS_AUTH_TOKEN, if set, must be sent by the
+# scraper as a bearer token; without it /metrics is refused unless DEBUG is on.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN', '')
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, 'api.metrics.MetricsMiddleware')
+
+# Serve the summary, history, upload and PDF endpoints with the async views
+# in api/async_views.py, for ASGI servers such as
+#   gunicorn chemical_analyzer.asgi:application -k uvicorn.workers.UvicornWorker
+# ASYNC_OFFLOAD_THREADS bounds the threads their blocking work runs in.
+ASYNC_ENDPOINTS = os.environ.get('ASYNC_ENDPOINTS', 'False').lower() == 'true'
+ASYNC_OFFLOAD_THREADS = int(os.environ.get('ASYNC_OFFLOAD_THREADS', '8'))
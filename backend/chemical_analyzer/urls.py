@@ -1,10 +1,16 @@
 """
 URL configuration for chemical_analyzer project.
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from api.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
-]
\ No newline at end of file
+]
+
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path('metrics', MetricsView.as_view(), name='metrics'))
@@ -0,0 +1,55 @@
+"""
+gunicorn settings, read automatically when gunicorn starts in this directory.
+"""
+
+import gc
+import os
+import shutil
+import tempfile
+
+
+# Load the application once in the master and fork workers from it, so they
+# start without importing anything and share the imported code copy-on-write.
+# Set GUNICORN_PRELOAD=False for --reload during development.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+# Directory where every worker process records its Prometheus samples, so
+# /metrics reports totals across workers (see api/metrics.py). One per
+# master process unless given, emptied on start.
+_own_metrics_dir = 'PROMETHEUS_MULTIPROC_DIR' not in os.environ
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), f'chemical-analyzer-metrics-{os.getpid()}')
+)
+# A preloaded application creates its metrics before on_starting runs
+os.makedirs(metrics_dir, exist_ok=True)
+
+
+def on_starting(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    # Django only loads the URLconf (and with it the views) on the first
+    # request, and pandas and reportlab on first use; import them here so
+    # workers inherit them instead of each paying for it on a request
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    import pandas  # noqa: F401
+    import api.report_builder  # noqa: F401
+    # Keep the garbage collector from writing to (and so copying) the pages
+    # of everything imported so far in every worker
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if _own_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
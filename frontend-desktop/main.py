@@ -1,16 +1,185 @@
+import io
+import os
 import sys
+import threading
+import time
+import uuid
 import requests
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QFileDialog, QLabel, 
                              QTableWidget, QTableWidgetItem, QMessageBox,
                              QGroupBox, QGridLayout, QSplitter, QDialog,
-                             QLineEdit, QFormLayout, QTabWidget, QHeaderView)
-from PyQt5.QtCore import Qt
+                             QLineEdit, QFormLayout, QTabWidget, QHeaderView,
+                             QProgressBar)
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
 
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Equipment rows fetched per page; more are fetched with "Load more rows"
+ROWS_PAGE_SIZE = 1000
+
+
+class TaskCancelled(Exception):
+    """
+    Raised inside a Task's function once the task has been cancelled.
+    """
+
+
+class TaskSignals(QObject):
+    """
+    Every signal carries the emitting Task first: a signal already queued
+    for the GUI thread is still delivered after the task is cancelled, so
+    slots compare it with their current task and ignore it if they differ.
+    """
+    # task, bytes done, bytes in total (None when unknown)
+    progress = pyqtSignal(object, object, object)
+    succeeded = pyqtSignal(object, object)
+    failed = pyqtSignal(object, object)
+
+
+class Task(QRunnable):
+    """
+    Runs fn(task, *args) on the global QThreadPool so network calls never
+    block the GUI thread. fn must not touch widgets; its result or exception
+    comes back through task.signals, whose slots run on the GUI thread.
+    """
+
+    # Seconds between progress signals, so large transfers do not flood
+    # the GUI thread's event queue
+    PROGRESS_INTERVAL = 0.05
+
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = TaskSignals()
+        self._cancelled = threading.Event()
+        self._last_progress = 0.0
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        Stop the task at its next progress report. A cancelled task emits
+        nothing more, though signals it emitted earlier may still arrive.
+        """
+        self._cancelled.set()
+        for signal in (self.signals.progress, self.signals.succeeded, self.signals.failed):
+            try:
+                signal.disconnect()
+            except TypeError:
+                # Nothing connected
+                pass
+
+    def report_progress(self, done, total):
+        """
+        Called by fn as data is transferred. Raises TaskCancelled once the
+        task is cancelled, which aborts the transfer.
+        """
+        if self.cancelled:
+            raise TaskCancelled()
+        now = time.monotonic()
+        if done == total or now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.signals.progress.emit(self, done, total)
+
+    def start(self):
+        QThreadPool.globalInstance().start(self)
+        return self
+
+    def run(self):
+        try:
+            result = self.fn(self, *self.args)
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(self, e)
+        else:
+            if not self.cancelled:
+                self.signals.succeeded.emit(self, result)
+
+
+class MultipartFileBody:
+    """
+    multipart/form-data request body holding one file, read by requests in
+    blocks while it is sent: the file is never loaded into memory at once,
+    and progress(sent, total) follows the bytes handed to the connection.
+    """
+
+    def __init__(self, path, field='file', data=None, progress=None):
+        boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        head = b''
+        for name, value in (data or {}).items():
+            head += (
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f'{value}\r\n'
+            ).encode('utf-8')
+        head += (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{os.path.basename(path)}"\r\n'
+            'Content-Type: text/csv\r\n\r\n'
+        ).encode('utf-8')
+        tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+        self.total = len(head) + os.path.getsize(path) + len(tail)
+        self.sent = 0
+        self.progress = progress
+        self._parts = [io.BytesIO(head), open(path, 'rb'), io.BytesIO(tail)]
+
+    def __len__(self):
+        # Lets requests send a Content-Length instead of a chunked body
+        return self.total
+
+    def read(self, size=-1):
+        data = b''
+        while self._parts and (size < 0 or len(data) < size):
+            chunk = self._parts[0].read(-1 if size < 0 else size - len(data))
+            if not chunk:
+                self._parts.pop(0).close()
+                continue
+            data += chunk
+        self.sent += len(data)
+        if self.progress is not None:
+            self.progress(self.sent, self.total)
+        return data
+
+    def close(self):
+        for part in self._parts:
+            part.close()
+        self._parts = []
+
+
+def error_message(resp, default):
+    if resp.headers.get('content-type', '').startswith('application/json'):
+        return resp.json().get('error', default)
+    return default
+
+
+def format_size(size):
+    return f'{size / (1024 * 1024):.1f} MB'
+
+
+def show_progress(bar, done, total, busy_text):
+    """
+    Show 'done' of 'total' bytes on a QProgressBar, or a busy indicator with
+    'busy_text' when the total is unknown or has been reached.
+    """
+    if total is None or done >= total:
+        bar.setRange(0, 0)
+        bar.setFormat(busy_text)
+    else:
+        bar.setRange(0, 100)
+        bar.setValue(int(done * 100 / total))
+        bar.setFormat(f'{format_size(done)} of {format_size(total)} (%p%)')
+
+
 class AuthDialog(QDialog):
     def __init__(self, api_base_url, session, parent=None):
         super().__init__(parent)
@@ -111,10 +280,12 @@ class AuthDialog(QDialog):
 
 
 class HistoryDialog(QDialog):
-    def __init__(self, api_base_url, session, parent=None):
+    def __init__(self, api_base_url, session, pdf_cache=None, parent=None):
         super().__init__(parent)
         self.api_base_url = api_base_url
         self.session = session
+        # dataset id -> (etag, pdf bytes), revalidated with If-None-Match
+        self.pdf_cache = pdf_cache if pdf_cache is not None else {}
 
         self.setWindowTitle('Upload History')
         self.setModal(True)
@@ -140,22 +311,55 @@ class HistoryDialog(QDialog):
         self.refresh_btn.clicked.connect(self.load_history)
         self.pdf_btn = QPushButton('Download PDF')
         self.pdf_btn.clicked.connect(self.download_selected_pdf)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        self.cancel_btn = QPushButton('Cancel')
+        self.cancel_btn.clicked.connect(self.cancel_download)
+        self.cancel_btn.hide()
         btn_row.addWidget(self.refresh_btn)
         btn_row.addWidget(self.pdf_btn)
+        btn_row.addWidget(self.progress_bar)
+        btn_row.addWidget(self.cancel_btn)
         layout.addLayout(btn_row)
 
+        self.history_task = None
+        self.download_task = None
         self.load_history()
 
+    def done(self, result):
+        # Closing the dialog abandons whatever it was still loading
+        for task in (self.history_task, self.download_task):
+            if task is not None:
+                task.cancel()
+        self.history_task = self.download_task = None
+        super().done(result)
+
     def load_history(self):
-        try:
-            resp = self.session.get(f'{self.api_base_url}/history/', timeout=15)
-            if resp.status_code == 401:
-                QMessageBox.warning(self, 'Unauthorized', 'Please login again.')
-                self.close()
-                return
-            data = resp.json()
-            datasets = data.get('datasets', [])
+        if self.history_task is not None:
+            return
+        self.refresh_btn.setEnabled(False)
+        self.history_task = Task(self._fetch_history)
+        self.history_task.signals.succeeded.connect(self.on_history_loaded)
+        self.history_task.signals.failed.connect(self.on_history_failed)
+        self.history_task.start()
+
+    def _fetch_history(self, task):
+        # Runs on a worker thread
+        resp = self.session.get(f'{self.api_base_url}/history/', timeout=15)
+        if resp.status_code == 401:
+            return None
+        return resp.json().get('datasets', [])
 
+    def on_history_loaded(self, task, datasets):
+        if task is not self.history_task:
+            return
+        self.history_task = None
+        self.refresh_btn.setEnabled(True)
+        if datasets is None:
+            QMessageBox.warning(self, 'Unauthorized', 'Please login again.')
+            self.close()
+            return
+        try:
             self.table.setRowCount(len(datasets))
             for r, d in enumerate(datasets):
                 self.table.setItem(r, 0, QTableWidgetItem(str(d.get('id'))))
@@ -168,6 +372,13 @@ class HistoryDialog(QDialog):
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Failed to load history: {e}')
 
+    def on_history_failed(self, task, error):
+        if task is not self.history_task:
+            return
+        self.history_task = None
+        self.refresh_btn.setEnabled(True)
+        QMessageBox.critical(self, 'Error', f'Failed to load history: {error}')
+
     def _selected_dataset_id(self):
         row = self.table.currentRow()
         if row < 0:
@@ -181,6 +392,8 @@ class HistoryDialog(QDialog):
             return None
 
     def download_selected_pdf(self):
+        if self.download_task is not None:
+            return
         dataset_id = self._selected_dataset_id()
         if not dataset_id:
             QMessageBox.information(self, 'Select Dataset', 'Please select a dataset row first.')
@@ -195,21 +408,86 @@ class HistoryDialog(QDialog):
         if not save_path:
             return
 
-        try:
-            resp = self.session.get(f'{self.api_base_url}/generate-pdf/{dataset_id}/', timeout=30)
-            if resp.status_code == 401:
-                QMessageBox.warning(self, 'Unauthorized', 'Please login again.')
-                self.close()
-                return
-            if resp.status_code != 200:
-                msg = resp.json().get('error', 'Failed to generate PDF') if resp.headers.get('content-type', '').startswith('application/json') else 'Failed to generate PDF'
-                QMessageBox.warning(self, 'Error', msg)
-                return
-            with open(save_path, 'wb') as f:
-                f.write(resp.content)
-            QMessageBox.information(self, 'Saved', f'PDF saved to:\n{save_path}')
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Failed to download PDF: {e}')
+        self.download_task = Task(self._download_pdf, dataset_id, save_path, self.pdf_cache.get(dataset_id))
+        self.download_task.signals.progress.connect(self.on_download_progress)
+        self.download_task.signals.succeeded.connect(self.on_download_finished)
+        self.download_task.signals.failed.connect(self.on_download_failed)
+        self._set_downloading(True)
+        self.download_task.start()
+
+    def _download_pdf(self, task, dataset_id, save_path, cached):
+        # Runs on a worker thread; the PDF cache is only updated by the
+        # GUI thread, from the returned result
+        headers = {}
+        if cached:
+            headers['If-None-Match'] = cached[0]
+        with self.session.get(
+            f'{self.api_base_url}/generate-pdf/{dataset_id}/',
+            headers=headers, timeout=30, stream=True,
+        ) as resp:
+            result = {'status': resp.status_code, 'dataset_id': dataset_id, 'save_path': save_path}
+            if resp.status_code == 304 and cached:
+                content = cached[1]
+            elif resp.status_code == 200:
+                length = resp.headers.get('Content-Length')
+                total = int(length) if length else None
+                chunks = []
+                received = 0
+                for chunk in resp.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    received += len(chunk)
+                    task.report_progress(received, total)
+                content = b''.join(chunks)
+                result['etag'] = resp.headers.get('ETag')
+                result['content'] = content
+            else:
+                if resp.status_code != 401:
+                    result['error'] = error_message(resp, 'Failed to generate PDF')
+                return result
+        with open(save_path, 'wb') as f:
+            f.write(content)
+        return result
+
+    def _set_downloading(self, downloading):
+        self.pdf_btn.setEnabled(not downloading)
+        self.progress_bar.setVisible(downloading)
+        self.cancel_btn.setVisible(downloading)
+        if downloading:
+            show_progress(self.progress_bar, 0, None, 'Generating PDF...')
+
+    def on_download_progress(self, task, received, total):
+        if task is not self.download_task:
+            return
+        show_progress(self.progress_bar, received, total, 'Downloading PDF...')
+
+    def cancel_download(self):
+        if self.download_task is not None:
+            self.download_task.cancel()
+            self.download_task = None
+        self._set_downloading(False)
+
+    def on_download_finished(self, task, result):
+        if task is not self.download_task:
+            return
+        self.download_task = None
+        self._set_downloading(False)
+        if result['status'] == 401:
+            QMessageBox.warning(self, 'Unauthorized', 'Please login again.')
+            self.close()
+            return
+        if 'error' in result:
+            QMessageBox.warning(self, 'Error', result['error'])
+            return
+        if result.get('etag'):
+            self.pdf_cache[result['dataset_id']] = (result['etag'], result['content'])
+        QMessageBox.information(self, 'Saved', f"PDF saved to:\n{result['save_path']}")
+
+    def on_download_failed(self, task, error):
+        if task is not self.download_task:
+            return
+        self.download_task = None
+        self._set_downloading(False)
+        QMessageBox.critical(self, 'Error', f'Failed to download PDF: {error}')
 
 
 class ChemicalEquipmentAnalyzer(QMainWindow):
@@ -220,6 +498,10 @@ class ChemicalEquipmentAnalyzer(QMainWindow):
         self.session = requests.Session()
         self.access_token = None
         self.username = None
+        self.pdf_cache = {}
+        self.upload_task = None
+        self.rows_task = None
+        self.next_cursor = None
         self.init_ui()
     
     def init_ui(self):
@@ -322,10 +604,20 @@ class ChemicalEquipmentAnalyzer(QMainWindow):
         """)
         self.upload_button.clicked.connect(self.upload_file)
         self.upload_button.setEnabled(False)
+
+        # Shown while an upload is running
+        self.upload_progress = QProgressBar()
+        self.upload_progress.setMinimumWidth(260)
+        self.upload_progress.hide()
+        self.cancel_upload_button = QPushButton('Cancel')
+        self.cancel_upload_button.clicked.connect(self.cancel_upload)
+        self.cancel_upload_button.hide()
         
         upload_layout.addWidget(self.file_label)
         upload_layout.addWidget(self.browse_button)
         upload_layout.addWidget(self.upload_button)
+        upload_layout.addWidget(self.upload_progress)
+        upload_layout.addWidget(self.cancel_upload_button)
         upload_group.setLayout(upload_layout)
         main_layout.addWidget(upload_group)
         
@@ -386,7 +678,17 @@ class ChemicalEquipmentAnalyzer(QMainWindow):
         table_layout = QVBoxLayout(table_widget)
         table_label = QLabel('Equipment Data Table')
         table_label.setStyleSheet("font-size: 14px; font-weight: bold; padding: 5px;")
-        table_layout.addWidget(table_label)
+        table_header = QHBoxLayout()
+        table_header.addWidget(table_label)
+        table_header.addStretch()
+        self.rows_label = QLabel('')
+        self.rows_label.setStyleSheet("color: #666; padding: 5px;")
+        table_header.addWidget(self.rows_label)
+        self.load_more_button = QPushButton('Load more rows')
+        self.load_more_button.clicked.connect(self.load_more_rows)
+        self.load_more_button.setVisible(False)
+        table_header.addWidget(self.load_more_button)
+        table_layout.addLayout(table_header)
         
         self.data_table = QTableWidget()
         self.data_table.setColumnCount(6)
@@ -419,7 +721,7 @@ class ChemicalEquipmentAnalyzer(QMainWindow):
         """)
     
     def _set_authenticated_state(self, authed):
-        self.upload_button.setEnabled(authed and hasattr(self, 'selected_file'))
+        self.upload_button.setEnabled(authed and hasattr(self, 'selected_file') and self.upload_task is None)
         self.history_btn.setEnabled(authed)
         self.logout_btn.setEnabled(authed)
 
@@ -433,10 +735,13 @@ class ChemicalEquipmentAnalyzer(QMainWindow):
             self._set_authenticated_state(True)
 
     def logout(self):
+        self.cancel_upload()
+        self.cancel_rows()
         self.access_token = None
         self.username = None
         if 'Authorization' in self.session.headers:
             del self.session.headers['Authorization']
+        self.pdf_cache.clear()
         self.user_label.setText('Not logged in')
         self._set_authenticated_state(False)
 
@@ -444,7 +749,7 @@ class ChemicalEquipmentAnalyzer(QMainWindow):
         if not self.access_token:
             QMessageBox.information(self, 'Login required', 'Please login first.')
             return
-        HistoryDialog(self.api_base_url, self.session, self).exec_()
+        HistoryDialog(self.api_base_url, self.session, self.pdf_cache, self).exec_()
 
     def create_summary_label(self, text):
         label = QLabel(text)
@@ -481,31 +786,163 @@ class ChemicalEquipmentAnalyzer(QMainWindow):
         if not self.access_token:
             QMessageBox.information(self, 'Login required', 'Please login first.')
             return
-        
+
+        if self.upload_task is not None:
+            return
+
+        self.cancel_rows()
+        self.upload_task = Task(self._upload, self.selected_file)
+        self.upload_task.signals.progress.connect(self.on_upload_progress)
+        self.upload_task.signals.succeeded.connect(self.on_upload_finished)
+        self.upload_task.signals.failed.connect(self.on_upload_failed)
+        self._set_uploading(True)
+        self.upload_task.start()
+
+    def _upload(self, task, path):
+        # Runs on a worker thread: streams the file, then fetches the first
+        # page of rows so the GUI thread only has to display them
+        body = MultipartFileBody(path, data={'summary_only': '1'}, progress=task.report_progress)
         try:
-            with open(self.selected_file, 'rb') as f:
-                files = {'file': f}
-                response = self.session.post(f'{self.api_base_url}/upload/', files=files, timeout=60)
-            
-            if response.status_code == 201:
-                data = response.json()
-                self.current_data = data
-                self.update_summary(data['summary'])
-                self.update_charts(data['summary'])
-                self.update_table(data['equipment_data'])
-                QMessageBox.information(self, 'Success', 'File uploaded and processed successfully!')
-            elif response.status_code == 401:
-                QMessageBox.warning(self, 'Unauthorized', 'Session expired. Please login again.')
-                self.logout()
-            else:
-                error_msg = response.json().get('error', 'Unknown error')
-                QMessageBox.warning(self, 'Error', f'Upload failed: {error_msg}')
-        
-        except requests.exceptions.ConnectionError:
+            response = self.session.post(
+                f'{self.api_base_url}/upload/',
+                data=body,
+                headers={'Content-Type': body.content_type},
+                timeout=60,
+            )
+        finally:
+            body.close()
+
+        result = {'status': response.status_code}
+        if response.status_code in (200, 201):
+            result['data'] = response.json()
+            result['page'] = self.fetch_rows(result['data']['dataset_id'])
+        elif response.status_code != 401:
+            result['error'] = error_message(response, 'Unknown error')
+        return result
+
+    def _set_uploading(self, uploading):
+        self.browse_button.setEnabled(not uploading)
+        self.upload_progress.setVisible(uploading)
+        self.cancel_upload_button.setVisible(uploading)
+        self._set_authenticated_state(bool(self.access_token))
+        if uploading:
+            show_progress(self.upload_progress, 0, 1, '')
+
+    def on_upload_progress(self, task, sent, total):
+        if task is not self.upload_task:
+            return
+        # Once the whole file is sent the server parses it
+        show_progress(self.upload_progress, sent, total, 'Processing on server...')
+
+    def cancel_upload(self):
+        """
+        Abandon the running upload. While the file is still being sent the
+        transfer stops; once it has been sent the server finishes processing
+        it, but the result is no longer shown.
+        """
+        if self.upload_task is None:
+            return
+        self.upload_task.cancel()
+        self.upload_task = None
+        self._set_uploading(False)
+        self.statusBar().showMessage('Upload cancelled', 5000)
+
+    def on_upload_finished(self, task, result):
+        if task is not self.upload_task:
+            return
+        self.upload_task = None
+        self._set_uploading(False)
+        if result['status'] in (200, 201):
+            data = result['data']
+            self.current_data = data
+            self.update_summary(data['summary'])
+            self.update_charts(data['summary'])
+            self.data_table.setRowCount(0)
+            self.show_rows(result['page'])
+            QMessageBox.information(self, 'Success', 'File uploaded and processed successfully!')
+        elif result['status'] == 401:
+            QMessageBox.warning(self, 'Unauthorized', 'Session expired. Please login again.')
+            self.logout()
+        else:
+            QMessageBox.warning(self, 'Error', f"Upload failed: {result['error']}")
+
+    def on_upload_failed(self, task, error):
+        if task is not self.upload_task:
+            return
+        self.upload_task = None
+        self._set_uploading(False)
+        if isinstance(error, requests.exceptions.ConnectionError):
             QMessageBox.critical(self, 'Connection Error', 
                                'Cannot connect to the backend server.\nMake sure the Django server is running on http://localhost:8000')
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', str(e))
+        else:
+            QMessageBox.critical(self, 'Error', str(error))
+    
+    def fetch_rows(self, dataset_id, cursor=None, limit=ROWS_PAGE_SIZE):
+        # Runs on a worker thread. Returns one page of rows as sent by the
+        # server (rows, count and next_cursor); large datasets are shown a
+        # page at a time rather than pulled in full
+        params = {'limit': limit}
+        if cursor:
+            params['cursor'] = cursor
+        resp = self.session.get(
+            f'{self.api_base_url}/datasets/{dataset_id}/rows/',
+            params=params,
+            timeout=30,
+        )
+        if resp.status_code != 200:
+            return {'dataset_id': dataset_id, 'rows': [], 'count': 0, 'next_cursor': None}
+        return resp.json()
+
+    def load_more_rows(self):
+        if self.rows_task is not None or not self.next_cursor or not self.current_data:
+            return
+        self.rows_task = Task(self._fetch_rows, self.current_data['dataset_id'], self.next_cursor)
+        self.rows_task.signals.succeeded.connect(self.on_rows_loaded)
+        self.rows_task.signals.failed.connect(self.on_rows_failed)
+        self.load_more_button.setEnabled(False)
+        self.load_more_button.setText('Loading...')
+        self.rows_task.start()
+
+    def _fetch_rows(self, task, dataset_id, cursor):
+        return self.fetch_rows(dataset_id, cursor)
+
+    def cancel_rows(self):
+        if self.rows_task is not None:
+            self.rows_task.cancel()
+            self.rows_task = None
+        self.load_more_button.setEnabled(True)
+        self.load_more_button.setText('Load more rows')
+
+    def on_rows_loaded(self, task, page):
+        if task is not self.rows_task:
+            return
+        self.cancel_rows()
+        # A page for a dataset that has since been replaced is dropped
+        if self.current_data and page.get('dataset_id') == self.current_data['dataset_id']:
+            self.show_rows(page)
+
+    def on_rows_failed(self, task, error):
+        if task is not self.rows_task:
+            return
+        self.cancel_rows()
+        self.statusBar().showMessage(f'Could not load more rows: {error}', 5000)
+
+    def show_rows(self, page):
+        """
+        Append a page of rows to the table and update the row count and
+        the "Load more rows" button.
+        """
+        self.append_rows(page.get('rows', []))
+        self.next_cursor = page.get('next_cursor')
+        shown = self.data_table.rowCount()
+        total = page.get('count', shown)
+        self.rows_label.setText(f'Showing {shown:,} of {total:,} rows' if total else '')
+        self.load_more_button.setVisible(bool(self.next_cursor))
+
+    def closeEvent(self, event):
+        self.cancel_upload()
+        self.cancel_rows()
+        super().closeEvent(event)
     
     def update_summary(self, summary):
         total = summary['total_equipment']
@@ -546,10 +983,11 @@ class ChemicalEquipmentAnalyzer(QMainWindow):
         self.type_chart_canvas.draw()
         self.avg_chart_canvas.draw()
     
-    def update_table(self, equipment_data):
-        self.data_table.setRowCount(len(equipment_data))
+    def append_rows(self, equipment_data):
+        start = self.data_table.rowCount()
+        self.data_table.setRowCount(start + len(equipment_data))
         
-        for row, item in enumerate(equipment_data):
+        for row, item in enumerate(equipment_data, start):
             self.data_table.setItem(row, 0, QTableWidgetItem(str(row + 1)))
             self.data_table.setItem(row, 1, QTableWidgetItem(str(item['Equipment Name'])))
             self.data_table.setItem(row, 2, QTableWidgetItem(str(item['Type'])))
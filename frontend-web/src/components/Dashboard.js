@@ -1,4 +1,5 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
+import axios from 'axios';
 import FileUpload from './FileUpload';
 import Summary from './Summary';
 import Charts from './Charts';
@@ -6,13 +7,48 @@ import DataTable from './DataTable';
 import Navbar from './Navbar';
 import './Dashboard.css';
 
+const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000/api';
+const ROWS_PAGE_SIZE = 1000;
+
 function Dashboard() {
   const [summaryData, setSummaryData] = useState(null);
   const [equipmentData, setEquipmentData] = useState([]);
+  const [rowsCount, setRowsCount] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingRows, setLoadingRows] = useState(false);
+  // Dataset whose rows are shown, so a page arriving after another upload is dropped
+  const datasetRef = useRef(null);
+
+  const fetchRows = async (datasetId, cursor) => {
+    setLoadingRows(true);
+    try {
+      const params = cursor ? { cursor, limit: ROWS_PAGE_SIZE } : { limit: ROWS_PAGE_SIZE };
+      const response = await axios.get(
+        `${API_BASE_URL}/datasets/${datasetId}/rows/`,
+        { params }
+      );
+      if (datasetRef.current !== datasetId) return;
+      setEquipmentData((rows) => rows.concat(response.data.rows));
+      setRowsCount(response.data.count);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error fetching equipment rows:', error);
+    } finally {
+      if (datasetRef.current === datasetId) setLoadingRows(false);
+    }
+  };
 
   const handleDataUploaded = (data) => {
+    datasetRef.current = data.dataset_id;
     setSummaryData(data.summary);
-    setEquipmentData(data.equipment_data);
+    setEquipmentData([]);
+    setRowsCount(0);
+    setNextCursor(null);
+    fetchRows(data.dataset_id, null);
+  };
+
+  const handleLoadMore = () => {
+    if (nextCursor && !loadingRows) fetchRows(datasetRef.current, nextCursor);
   };
 
   return (
@@ -30,7 +66,13 @@ function Dashboard() {
           <>
             <Summary data={summaryData} />
             <Charts data={summaryData} />
-            <DataTable data={equipmentData} />
+            <DataTable
+              data={equipmentData}
+              total={rowsCount}
+              hasMore={nextCursor !== null}
+              loading={loadingRows}
+              onLoadMore={handleLoadMore}
+            />
           </>
         )}
       </div>
@@ -38,4 +80,4 @@ function Dashboard() {
   );
 }
 
-export default Dashboard;
\ No newline at end of file
+export default Dashboard;
@@ -1,11 +1,16 @@
 import React from 'react';
 
-function DataTable({ data }) {
+function DataTable({ data, total, hasMore, loading, onLoadMore }) {
   if (!data || data.length === 0) return null;
 
   return (
     <div className="table-section">
       <h2>Equipment Data Table</h2>
+      {total > 0 && (
+        <p className="table-count">
+          Showing {data.length.toLocaleString()} of {total.toLocaleString()} rows
+        </p>
+      )}
       <div style={{ overflowX: 'auto' }}>
         <table className="data-table">
           <thead>
@@ -32,6 +37,11 @@ function DataTable({ data }) {
           </tbody>
         </table>
       </div>
+      {hasMore && (
+        <button className="load-more-button" onClick={onLoadMore} disabled={loading}>
+          {loading ? 'Loading...' : 'Load more rows'}
+        </button>
+      )}
     </div>
   );
 }
@@ -29,6 +29,7 @@ function FileUpload({ onDataUploaded }) {
 
     const formData = new FormData();
     formData.append('file', file);
+    formData.append('summary_only', '1');
 
     setUploading(true);
     setMessage({ text: 'Uploading and processing...', type: '' });